@@ -0,0 +1,58 @@
+from lib.tools.conversions import mrp2dcm
+
+
+class StepContext(object):
+    ''' Per time step vehicle context shared by the controller and pointing modes.
+        Orbit, frame and relay quantities are computed on first use only '''
+
+    def __init__(self, n=0, delta=1, state=None, Pointing=None, Target=None, control_torque=None):
+        self.n = n
+        self.delta = delta
+        self.state = state
+        self.control_torque = control_torque
+
+        self._Pointing = Pointing
+        self._Target = Target
+
+        # Memoized quantities
+        self._orbit = None
+        self._local = None
+        self._lvlh = None
+        self._body_dcm = None
+        self._target = None
+
+    @property
+    def orbit(self):
+        ''' Orbit state (inertial lunar frame) at this step '''
+        if self._orbit is None:
+            self._orbit = self._Pointing.Orbit.inertial_solution(self.n*self.delta)
+        return self._orbit
+
+    @property
+    def local(self):
+        ''' Orbit states at this and the next step (6x2) '''
+        if self._local is None:
+            self._local = self._Pointing.Orbit.inertial_solution([self.n*self.delta, (self.n+1)*self.delta])
+            self._orbit = self._local[:,[0]]
+        return self._local
+
+    @property
+    def lvlh(self):
+        ''' Inertial to LVLH (Hill) frame at this step '''
+        if self._lvlh is None:
+            self._lvlh = self._Pointing.nadir.inertial_to_lvlh(self.orbit)
+        return self._lvlh
+
+    @property
+    def body_dcm(self):
+        ''' Inertial to body frame from the vehicle attitude (MRP) '''
+        if self._body_dcm is None:
+            self._body_dcm = mrp2dcm(self.state[0:3])
+        return self._body_dcm
+
+    @property
+    def target(self):
+        ''' Relay target position relative to the vehicle at this and the next step (6x2) '''
+        if self._target is None:
+            self._target = self._Pointing.relay.track(self._Target, self)
+        return self._target
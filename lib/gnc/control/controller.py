@@ -1,8 +1,9 @@
 import numpy
 
 from lib.gnc.control import modes
-from lib.tools.conversions import mrp2dcm
 from lib.tools.conversions import dcm2mrp
+from lib.tools.conversions import mrp2dcm_batch
+from lib.tools.conversions import dcm2mrp_batch
 from lib.gnc.control.modes.stub_pointing import Stub
 
 
@@ -13,37 +14,71 @@ class Controller(object):
         self._tau = tau              # Decay time
         self._moi = None             # Principal moments
 
+        # Gain set (see configure)
+        self._kp = None
+        self._ku = None
+        self._moi_inv = None
+
         # Controls
         self.set_pointing()
 
+    def configure(self, moi=None, tau=None):
+        ''' Set the moments and/or decay time, precomputing the gain set '''
+        if moi is not None:
+            self._moi = moi
+            self._moi_inv = numpy.linalg.inv(moi)
+        if tau is not None:
+            self._tau = tau
+
+        if self._moi is not None:
+            self._kp = numpy.linalg.norm(self._moi/self._tau, numpy.inf)
+            self._ku = 2*numpy.linalg.norm(self._moi/self._tau**2, numpy.inf)
+        return
+
     def set_pointing(self, mode=Stub()):
         self._mode = mode
         self._frame = mode.inertial_to_control
         return
 
-    def get_control_torque(self, **kwargs):
+    def get_control_torque(self, context=None):
         ''' Obtain the necessary control torque '''
-        state_estimate = self._estimate_current_state(**kwargs)
-        
-        kp = numpy.linalg.norm(self._moi/self._tau, numpy.inf)
-        ku = 2*numpy.linalg.norm(self._moi/self._tau**2, numpy.inf)
-
-        MOI_INV = numpy.linalg.inv(self._moi)
-        state_estimate = ku*state_estimate[0:3] + kp*state_estimate[3:6]
+        state_estimate = self._estimate_current_state(context)
+        state_estimate = self._ku*state_estimate[0:3] + self._kp*state_estimate[3:6]
         state_estimate = numpy.reshape(state_estimate, (3,1))
-        return -numpy.matmul(MOI_INV, state_estimate)
+        return -numpy.matmul(self._moi_inv, state_estimate)
+
+    def get_control_torque_batch(self, states=None, frames=None, rates=None):
+        ''' Obtain the control torques (N x 3) for stacked vehicle states (N x 6),
+            inertial to control frames (N x 3 x 3) and control frame rates (N x 3) '''
+        states = numpy.asarray(states, dtype='float')
+
+        # Body to control frame
+        BYI2BDY = mrp2dcm_batch(states[:,0:3])
+        BDY2REF = numpy.matmul(frames, numpy.swapaxes(BYI2BDY, 1, 2))
+
+        # Body update
+        mrp_attitude = dcm2mrp_batch(numpy.swapaxes(BDY2REF, 1, 2))
+        rates_vector = states[:,3:6] - numpy.einsum('nij,nj->ni', BYI2BDY, rates)
+
+        state_estimate = self._ku*mrp_attitude + self._kp*rates_vector
+        return -numpy.einsum('ij,nj->ni', self._moi_inv, state_estimate)
+
+    def get_feedback_jacobian(self):
+        ''' Torque Jacobian (3x6) of the PD law with respect to the vehicle state '''
+        # Small attitude and rate errors follow the state one to one
+        return -numpy.concatenate((self._ku*self._moi_inv, self._kp*self._moi_inv), axis=1)
 
-    def _estimate_current_state(self, **kwargs):
+    def _estimate_current_state(self, context=None):
         ''' Estimate the relative state for the given control frame '''
-        vehicle_states = kwargs['state']
+        vehicle_states = context.state
 
         # Ascertain state information
         mrp_attitude = numpy.reshape(vehicle_states[0:3], (3,1))
         rates_vector = numpy.reshape(vehicle_states[3:6], (3,1))
 
         # Construct the inertial to control frame
-        BYI2BDY = mrp2dcm(mrp_attitude)
-        BYI2REF = self._frame(**kwargs)
+        BYI2BDY = context.body_dcm
+        BYI2REF = self._frame(context)
 
         # Body to control frame
         BDY2REF = numpy.matmul(BYI2REF, BYI2BDY.T)
@@ -51,7 +86,7 @@ class Controller(object):
         # Body update
         mrp_attitude = dcm2mrp(BDY2REF.T)
         rates_vector = numpy.matmul(BYI2BDY.T, rates_vector) - \
-                       self._mode.relative_rates(**kwargs)
+                       self._mode.relative_rates(context)
         rates_vector = numpy.matmul(BYI2BDY, rates_vector)
 
         vehicle_bdy_update = numpy.empty((6,1))
@@ -11,14 +11,14 @@ class Nadir(Frames):
         super(Nadir, self).__init__()
         self.fname = 'nadir'
 
-    def relative_rates(self, **kwargs):
+    def relative_rates(self, context=None):
         ''' Relative rate calculation for the nadir frame '''
-        state_vector = kwargs['orbit']
+        state_vector = context.orbit
         r_vector = numpy.reshape(state_vector[0:3], (3,1))
         v_vector = numpy.reshape(state_vector[3:6], (3,1))
 
         # Transform to LVLH (Hill) frame
-        BYI2LVH = self.inertial_to_lvlh(state_vector)
+        BYI2LVH = context.lvlh
         r_vector = numpy.matmul(BYI2LVH, r_vector)
         v_vector = numpy.matmul(BYI2LVH, v_vector)
 
@@ -30,11 +30,9 @@ class Nadir(Frames):
         rates = numpy.matmul(BYI2LVH.T, w_vector)
         return rates
 
-    def inertial_to_control(self, **kwargs):
+    def inertial_to_control(self, context=None):
         ''' Inertial origin frame to orbiter nadir pointing frame '''
-        state_vector = kwargs['orbit']
-
-        BYI2LVH = self.inertial_to_lvlh(state_vector)
+        BYI2LVH = context.lvlh
 
         # Antenna normally facing away from nadir
         # To point toward nadir, simply reflect x
@@ -44,7 +42,7 @@ class Nadir(Frames):
         BYI2NAD[2,:] = numpy.cross(BYI2NAD[0,:], BYI2NAD[1,:])
         return BYI2NAD
 
-    def control_to_inertial(self, **kwargs):
+    def control_to_inertial(self, context=None):
         ''' Orbiter nadir pointing frame to inertial origin frame '''
-        BYI2NAD = self.inertial_to_control(**kwargs)
+        BYI2NAD = self.inertial_to_control(context)
         return BYI2NAD.T
\ No newline at end of file
@@ -12,20 +12,20 @@ class Communication(Frames):
         super(Communication, self).__init__()
         self.fname = 'communication'
 
-    def track(self, Target=None, **kwargs):
+    def track(self, Target=None, context=None):
         ''' Sync to the vehicle that is being tracked '''
-        (ni,nf) = kwargs['nspan']
-        tspan = (ni*kwargs['delta'],nf*kwargs['delta'])
+        (ni,nf) = (context.n, context.n+1)
+        tspan = (ni*context.delta,nf*context.delta)
         tracked_positions = Target.query_states(tspan)
-        current_positions = kwargs['local']
+        current_positions = context.local
 
         delta_positions = tracked_positions-current_positions
         return delta_positions
 
-    def update_span(self, **kwargs):
+    def update_span(self, context=None):
         ''' Update the vehicle delta span information '''
-        delta_position = kwargs['target'][0:3,0]
-        vehicle_position = kwargs['local'][0:3,0]
+        delta_position = context.target[0:3,0]
+        vehicle_position = context.local[0:3,0]
 
         target_position = delta_position + vehicle_position
 
@@ -37,18 +37,11 @@ class Communication(Frames):
         delta_angle = math.acos(projection/(position_norm*tracking_norm))
         return delta_angle
 
-    def relative_rates(self, **kwargs):
+    def relative_rates(self, context=None):
         ''' Relative rate calculation for the relay frame '''
-        delta_present = kwargs['target'][:,0]
-        delta_tracked = kwargs['target'][:,-1]        
-
-        # Prepare the current state attitude
-        kwargs['target'] = numpy.reshape(delta_present, (6,1))
-        BYI2COM_n = self.inertial_to_control(**kwargs)
-
-        # Prepare the future state attitude
-        kwargs['target'] = numpy.reshape(delta_tracked, (6,1))
-        BYI2COM_f = self.inertial_to_control(**kwargs)
+        # Current and future state attitudes
+        BYI2COM_n = self._communication_frame(context.target[0:3,0])
+        BYI2COM_f = self._communication_frame(context.target[0:3,-1])
 
         # Rate matrix (from derivative)
         DELTA = BYI2COM_f-BYI2COM_n
@@ -60,10 +53,12 @@ class Communication(Frames):
         rates = numpy.asarray([w0,w1,w2])
         return numpy.reshape(rates, (3,1))
 
-    def inertial_to_control(self, **kwargs):
+    def inertial_to_control(self, context=None):
         ''' Inertial origin frame to orbiter communication frame '''
-        position = kwargs['target'][0:3,0]
+        return self._communication_frame(context.target[0:3,0])
 
+    def _communication_frame(self, position=None):
+        ''' Communication frame for the relative target position '''
         # Create axis along node line
         n = numpy.asarray([0,0,1])
         n_position = numpy.cross(position.T, n.T)
@@ -75,7 +70,7 @@ class Communication(Frames):
         BYI2COM[2,:] = numpy.cross(BYI2COM[0,:], BYI2COM[1,:])
         return BYI2COM
 
-    def control_to_inertial(self, **kwargs):
+    def control_to_inertial(self, context=None):
         ''' Orbiter communication frame to inertial origin frame '''
-        BYI2COM = self.inertial_to_control(**kwargs)
+        BYI2COM = self.inertial_to_control(context)
         return BYI2COM.T
\ No newline at end of file
@@ -4,10 +4,10 @@ import numpy
 class Stub(object):
     ''' Controller Stub '''
 
-    def relative_rates(self, **kwargs):
+    def relative_rates(self, context=None):
         ''' Passthrough '''
         return numpy.ones((6,1))
 
-    def inertial_to_control(self, **kwargs):
+    def inertial_to_control(self, context=None):
         ''' Passthrough '''
         return numpy.identity(3)
\ No newline at end of file
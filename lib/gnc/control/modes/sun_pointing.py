@@ -1,7 +1,6 @@
 import numpy
 
 from lib.gnc.control.frames import Frames
-from lib.tools.conversions import mrp2dcm
 from lib.tools.conversions import unit_vector
 
 
@@ -12,14 +11,14 @@ class Sun(Frames):
         super(Sun, self).__init__()
         self.fname = 'sun'
 
-    def relative_rates(self, **kwargs):
+    def relative_rates(self, context=None):
         ''' Relative rate calculation for the sun frame '''
-        state_vector = kwargs['orbit']
+        state_vector = context.orbit
         r_vector = numpy.reshape(state_vector[0:3], (3,1))
         v_vector = numpy.reshape(state_vector[3:6], (3,1))
 
         # Transform to LVLH (Hill) frame
-        BYI2LVH = self.inertial_to_lvlh(state_vector)
+        BYI2LVH = context.lvlh
         r_vector = numpy.matmul(BYI2LVH, r_vector)
         v_vector = numpy.matmul(BYI2LVH, v_vector)
 
@@ -31,10 +30,9 @@ class Sun(Frames):
         rates = numpy.matmul(BYI2LVH.T, w_vector)
         return rates
 
-    def inertial_to_control(self, **kwargs):
+    def inertial_to_control(self, context=None):
         ''' Inertial origin frame to orbiter sun pointing frame '''
-        attitude = kwargs['state'][0:3,:]
-        BYI2BDY = mrp2dcm(attitude)
+        BYI2BDY = context.body_dcm
         
         BDY2BYI = BYI2BDY.T
 
@@ -49,7 +47,7 @@ class Sun(Frames):
         BYI2SUN = numpy.matmul(BDY2SUN, BYI2BDY)
         return BYI2SUN
 
-    def control_to_inertial(self, **kwargs):
+    def control_to_inertial(self, context=None):
         ''' Orbiter sun pointing frame to inertial origin frame '''
-        BYI2SUN = self.inertial_to_control(**kwargs)
+        BYI2SUN = self.inertial_to_control(context)
         return BYI2SUN.T
\ No newline at end of file
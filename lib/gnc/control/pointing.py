@@ -1,5 +1,7 @@
 import numpy
 
+from lib.tools.conversions import deg2rad
+
 from lib.gnc.control.modes.sun_pointing import Sun
 from lib.gnc.control.modes.nadir_pointing import Nadir
 from lib.gnc.control.modes.relay_pointing import Communication
@@ -8,6 +10,9 @@ from lib.gnc.control.modes.relay_pointing import Communication
 class Pointing(object):
     ''' Pointing Dynamics Base Class '''
 
+    # Mode timeline labels (relay is nadir pointing with tracking)
+    MODES = ('sun', 'nadir', 'relay')
+
     def __init__(self, Orbit=None):
         self.Orbit = Orbit
 
@@ -16,13 +21,43 @@ class Pointing(object):
         self.nadir = Nadir()
         self.relay = Communication()
 
-    def get_state_range(self, **kwargs):
-        ''' Returns the range of states dn '''
-        dn = kwargs['nspan']
-        samples = 1+(dn[-1]-dn[0])
-        state_subset = numpy.empty((6,0))
+    def transition_radius(self):
+        ''' Orbit radius below which the sun and relay modes are available '''
+        e = self.Orbit.Kepler.eccentricity
+        a = self.Orbit.Kepler.semi_major_axis
+        return a*(1-e**2)/(1+e*numpy.cos(deg2rad(165)))
+
+    def _mode_codes(self, states=None, tracking=False):
+        ''' Mode timeline label indices for a (6xN) set of orbit states '''
+        transition_parameter = numpy.linalg.norm(states, axis=0) < self.transition_radius()
+        sun_parameter = transition_parameter & (states[0] <= 0)
+
+        codes = numpy.ones(states.shape[1], dtype=int)
+        codes[sun_parameter] = 0
+        if tracking:
+            codes[transition_parameter & ~sun_parameter] = 2
+        return codes
+
+    def _refine_transition(self, lower=0, upper=1, tracking=False):
+        ''' Bisect for the first time in (lower, upper] with a new mode '''
+        code = self._mode_codes(self.Orbit.inertial_solution(lower), tracking)[0]
+        tolerance = 1e-9*max(1, abs(upper))
+
+        while upper-lower > tolerance:
+            middle = .5*(lower+upper)
+            if self._mode_codes(self.Orbit.inertial_solution(middle), tracking)[0] == code:
+                lower = middle
+            else:
+                upper = middle
+        return upper
+
+    def build_timeline(self, t=None, tracking=False):
+        ''' Precompute the mode intervals (start times and labels) over the times t '''
+        t = numpy.asarray(t, dtype='float')
+        codes = self._mode_codes(self.Orbit.inertial_solution(t), tracking)
 
-        for n in range(samples):
-            state = self.Orbit.inertial_solution(n*kwargs['delta'])
-            state_subset = numpy.append(state_subset, state, axis=1)
-        return state_subset
\ No newline at end of file
+        # Transitions are bracketed by the samples and refined by bisection
+        changes = numpy.flatnonzero(codes[1:] != codes[:-1])
+        times = [t[0]] + [self._refine_transition(t[idx], t[idx+1], tracking) for idx in changes]
+        modes = [self.MODES[codes[0]]] + [self.MODES[codes[idx+1]] for idx in changes]
+        return [numpy.asarray(times), modes]
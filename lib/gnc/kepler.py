@@ -22,25 +22,31 @@ class Kepler(object):
         self.apogee = a*(1+e)
     
     @classmethod
-    def mean_anomaly(cls, **kwargs):
-        ''' Governing dynamics for the mean anomaly '''
-        e = kwargs['e']
-        E = kwargs['x']
-        M = kwargs['M']
-        f = (E - e*math.sin(E)) - M
-        return f
-
-    @classmethod
-    def mean_anomaly_df(cls, **kwargs):
-        ''' Required for Newton Raphson method '''
-        e = kwargs['e']
-        E = kwargs['x']
-        df = 1 - e*math.cos(E)
-        return df
-
-    def perifocal_to_orbital(self):
-        ''' Perifocal PQW frame to orbital frame '''
-        phi = (-self.true_anomaly, math.pi/2, 3*math.pi/2)
+    def eccentric_anomaly(cls, M=0, e=0, tolerance=1e-12, max_iters=16):
+        ''' Solve Kepler's equation for an array of mean anomalies (Halley) '''
+        M = numpy.mod(M, 2*math.pi)
+
+        # Danby starter, within a few degrees for e < 1
+        E = M + 0.85*e*numpy.sign(numpy.sin(M))
+
+        for curr_iter in range(max_iters):
+            e_sin = e*numpy.sin(E)
+            e_cos = e*numpy.cos(E)
+
+            f = E - e_sin - M
+            df = 1 - e_cos
+            dE = f/(df - 0.5*f*e_sin/df)
+
+            E = E - dE
+            if numpy.max(numpy.abs(dE)) < tolerance:
+                break
+        return E
+
+    def perifocal_to_orbital(self, nu=None):
+        ''' Perifocal PQW frame to orbital frame (at true anomaly nu) '''
+        if nu is None:
+            nu = self.true_anomaly
+        phi = (-nu, math.pi/2, 3*math.pi/2)
         R = euler_232(phi)
         # Each partition is 3x3 so matrix is 6x6
         # PQR2ORB = | R      ZEROS |
@@ -50,8 +56,8 @@ class Kepler(object):
         PQR2ORB[3:,3:] = R
         return PQR2ORB
 
-    def orbital_to_perifocal(self):
-        ''' Orbital frame to perifocal PQW frame '''
-        PQR2ORB = self.perifocal_to_orbital()
+    def orbital_to_perifocal(self, nu=None):
+        ''' Orbital frame to perifocal PQW frame (at true anomaly nu) '''
+        PQR2ORB = self.perifocal_to_orbital(nu)
         return PQR2ORB.T
         
\ No newline at end of file
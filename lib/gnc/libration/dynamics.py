@@ -4,6 +4,9 @@ import lib.tools.math_toolbox.ode.solver as solver
 
 from lib.gnc.libration.frames import Frames
 from lib.tools.physics_toolbox import energy
+from lib.simcore.support.cache import CACHE
+from lib.simcore.support.datatypes import PeriodicTrajectory
+from lib.simcore.support.exceptions import ConvergenceError
 from lib.tools.math_toolbox.integration.integrands import CRTBP as Functional
 
 
@@ -39,61 +42,97 @@ class Orbit(object):
                 true_root = numpy.absolute(roots[idx])
         return true_root
 
-    def get_barycenter_fixed_solution(self, N=1, **kwargs):
-        ''' Compute the orbit trajectory after N orbits '''
-        kwargs['mu'] = self.mu
-        kwargs['delta'] = self.Params.step
-        kwargs['tspan'] = (0, self.Params.period/2)
-        
-        halo_solution = numpy.empty((6,0))
-        current_state = numpy.append(self.Params.position, self.Params.velocity)
-        current_state = numpy.reshape(current_state, (1,6))
+    @staticmethod
+    def _xz_plane_crossing(t, y):
+        ''' Event function for the x-z plane (y = 0) '''
+        # The y coordinate is the fifth entry from the end of
+        # both the state and the state transition layouts
+        return y[-5,0]
 
-        # Principal orbit
-        kwargs['state'] = current_state.T
-        [_, vstate] = solver.ode113v(**kwargs)
-        
-        # Using the current state solution, calculate the
-        # state matrix required for the current trajectory
+    def _half_period_crossing(self, current_state, **kwargs):
+        ''' Propagate the state matrix to the x-z plane crossing '''
         multibody_state = numpy.identity(6)
         multibody_state = numpy.reshape(multibody_state, (6**2,1))
         kwargs['state'] = numpy.append(multibody_state, current_state.T, axis=0)
-        [t_span, mstate]  = solver.ode113m(**kwargs)
+        kwargs['event'] = self._xz_plane_crossing
+        [t_span, mstate] = solver.ode113m(**kwargs)
 
         # State matrix vector representation conversion back to matrix
         A = numpy.reshape(mstate[:36,-1], (6,6))
+        return [t_span[-1], A, mstate[36:,[-1]]]
 
-        # Obtain the directional vector field
-        kwargs['y'] = vstate
-        vfield = Functional.vfhandle(**kwargs)
+    def get_corrected_solution(self, tol=1e-10, max_iter=20, **kwargs):
+        ''' Converge the initial state and period of the halo orbit (and its trajectory) '''
+        kwargs['mu'] = self.mu
+        kwargs['delta'] = self.Params.step
+        kwargs['tspan'] = (0, self.Params.period)
 
-        # Solution to state matrix confined to vector field
-        # generated by the corresponding state solution at time t
-        dF = numpy.asarray([[A[3,0], A[3,4], vfield[3].item()], \
-                            [A[5,0], A[5,4], vfield[5].item()], \
-                            [A[1,0], A[1,4], vfield[1].item()]], dtype='float')
+        current_state = numpy.append(self.Params.position, self.Params.velocity)
+        current_state = numpy.reshape(current_state, (1,6))
+
+        for idx in range(max_iter):
+            [half_period, A, vstate] = self._half_period_crossing(current_state, **kwargs)
+
+            # Symmetric orbits cross the x-z plane perpendicularly
+            residual = numpy.hypot(vstate[3,0], vstate[5,0])
+            if residual < tol:
+                break
+
+            # Obtain the directional vector field
+            kwargs['y'] = vstate
+            vfield = Functional.vfhandle(**kwargs)
+
+            # Solution to state matrix confined to vector field
+            # generated by the corresponding state solution at time t
+            dF = numpy.asarray([[A[3,0], A[3,4], vfield[3].item()], \
+                                [A[5,0], A[5,4], vfield[5].item()], \
+                                [A[1,0], A[1,4], vfield[1].item()]], dtype='float')
+            push_state = numpy.asarray([vstate[3,0], vstate[5,0], vstate[1,0]])
+
+            # Update the initial conditions and the half period
+            # given the current directional state space solution
+            correction = numpy.linalg.solve(dF, push_state)
+            current_state[0,0] -= correction[0]
+            current_state[0,4] -= correction[1]
+            kwargs['tspan'] = (0, 2*(half_period-correction[2]))
+        else:
+            raise ConvergenceError()
 
-        inv_dF = numpy.linalg.inv(dF)
-        push_state = numpy.asarray([[vstate[3,-1], vstate[5,-1], vstate[1,-1]]])
-        
-        # Estimate the initial conditions for the next trajectory
-        # given the current directional state space solution
-        next_state_estimate = numpy.asarray([[current_state[0,0], current_state[0,4], t_span[-1]]])
-        next_state_estimate = next_state_estimate.T - numpy.matmul(inv_dF, push_state.T)            
-        next_state = numpy.asarray([[next_state_estimate[0,0], 0, self.Params.position[2], 0, next_state_estimate[1,0], 0]])
-
-        # Calculate an initial guess at the orbital period
-        # index+1 given small deviations in the orbital path
-        timespan = (0, next_state_estimate[2,-1])
-        current_state = next_state
-    
         # Taking advantage of orbital symmetry by
-        # multiplying the given trajectory time by two
-        kwargs['state'] = current_state.T
-        kwargs['tspan'] = (0, 2*timespan[-1])
-        [_, trajectory] = solver.ode113v(**kwargs)
+        # multiplying the given trajectory time by two.
+        # The state rows of the monodromy propagation
+        # are the principal orbit trajectory, sampled on
+        # a grid that divides the period (closing sample
+        # at exactly one period)
+        period = 2*half_period
+        kwargs['tspan'] = (0, period)
+        kwargs['delta'] = period/numpy.ceil(period/self.Params.step)
+        multibody_state = numpy.identity(6)
+        multibody_state = numpy.reshape(multibody_state, (6**2,1))
+        kwargs['state'] = numpy.append(multibody_state, current_state.T, axis=0)
+        [_, mstate] = solver.ode113m(**kwargs)
+        monodromy = numpy.reshape(mstate[:36,-1], (6,6))
+        trajectory = numpy.array(mstate[36:])
+        return [current_state[0], period, monodromy, residual, trajectory]
+
+    def get_barycenter_fixed_solution(self, N=1, tol=1e-10, max_iter=20, **kwargs):
+        ''' Compute the orbit trajectory after N orbits '''
+        # The corrector options are passed explicitly so
+        # the key always holds the effective values
+        key = CACHE.key(kind='libration', integrator=solver.ode113m.__name__, mu=self.mu,   \
+                        position=self.Params.position, velocity=self.Params.velocity,    \
+                        period=self.Params.period, step=self.Params.step,                \
+                        tol=tol, max_iter=max_iter, options=kwargs)
+
+        # Previously computed principal orbits are memory mapped
+        trajectory = CACHE.load(key)
+        if trajectory is None:
+            [_, period, _, _, trajectory] = self.get_corrected_solution(tol, max_iter, **kwargs)
+
+            # The sample times are cached with the states
+            times = numpy.linspace(0, period, trajectory.shape[1])
+            trajectory = numpy.append(numpy.reshape(times, (1,-1)), trajectory, axis=0)
+            CACHE.store(key, trajectory)
         
-        # Save computation time by copying principal orbit
-        for idx in range(N):
-            halo_solution = numpy.append(halo_solution, trajectory, axis=1)
-        return halo_solution
\ No newline at end of file
+        # Save computation time by viewing the principal orbit N times
+        return PeriodicTrajectory(trajectory[1:], cycles=N, period=trajectory[0,-1])
@@ -1,4 +1,3 @@
-import math
 import numpy
 
 from lib.simcore.support.variables import GLOBALS
@@ -15,82 +14,86 @@ class Frames(object):
     def _fixed_rotation(self, relative_frame_angle=0):
         ''' Generate the rotation matrix for a general inertial barycentric
             body centered frame to the rotating (fixed) barycentric frame '''
-        FBY2BYIpos = numpy.asarray([[+math.cos(relative_frame_angle), -math.sin(relative_frame_angle), 0], \
-                                    [+math.sin(relative_frame_angle), +math.cos(relative_frame_angle), 0], \
-                                    [0, 0, 1]])
+        return self._fixed_rotation_batch(numpy.asarray([relative_frame_angle]))[:,:,0]
 
-        FBY2BYIdot = numpy.asarray([[-math.sin(relative_frame_angle), -math.cos(relative_frame_angle), 0], \
-                                    [+math.cos(relative_frame_angle), -math.sin(relative_frame_angle), 0], \
-                                    [0, 0, 0]])
-
-        ZEROS = numpy.zeros((3,3))
+    def _fixed_rotation_batch(self, relative_frame_angles=None):
+        ''' Generate the (6x6xN) rotation matrices for N relative frame angles '''
+        cos_angle = numpy.cos(relative_frame_angles)
+        sin_angle = numpy.sin(relative_frame_angles)
 
         # Each partition is 3x3 so matrix is 6x6
         # FBY2BYI = | FBY2BYIpos  ZEROS      |
         #           | FBY2BYIdot  FBY2BYIpos |
-        FBY2BYI = numpy.zeros((6,6))
-        FBY2BYI[:,:3] = numpy.concatenate((FBY2BYIpos, FBY2BYIdot), axis=0)
-        FBY2BYI[:,3:] = numpy.concatenate((ZEROS, FBY2BYIpos), axis=0)
+        FBY2BYI = numpy.zeros((6,6,cos_angle.size))
+        for offset in (0, 3):
+            FBY2BYI[offset+0,offset+0] = +cos_angle
+            FBY2BYI[offset+0,offset+1] = -sin_angle
+            FBY2BYI[offset+1,offset+0] = +sin_angle
+            FBY2BYI[offset+1,offset+1] = +cos_angle
+            FBY2BYI[offset+2,offset+2] = 1
+
+        FBY2BYI[3,0] = -sin_angle
+        FBY2BYI[3,1] = -cos_angle
+        FBY2BYI[4,0] = +cos_angle
+        FBY2BYI[4,1] = -sin_angle
         return FBY2BYI
 
-    def barycenter_fixed_to_barycenter_lunar_inertial(self, state_vector=None):
+    def _rotate_batch(self, trajectory=None, transpose=False):
+        ''' Rotate each column of a (6xN) trajectory by its own frame angle '''
+        trajectory = numpy.asarray(trajectory, dtype='float')
+        relative_frame_angles = numpy.arctan2(trajectory[1], trajectory[0])
+
+        FBY2BYI = self._fixed_rotation_batch(relative_frame_angles)
+        if transpose:
+            return numpy.einsum('jin,jn->in', FBY2BYI, trajectory)
+        return numpy.einsum('ijn,jn->in', FBY2BYI, trajectory)
+
+    def barycenter_fixed_to_barycenter_lunar_inertial_batch(self, trajectory=None):
         ''' Rotating barycenter frame (normalized) to inertial barycenter lunar origin frame (SI units) '''
-        x_barycenter = state_vector[0]
-        y_barycenter = state_vector[1]
+        trajectory = self._rotate_batch(trajectory)
+        trajectory *= GLOBALS.EARTH['TO_MOON']
+        trajectory[0] -= GLOBALS.EARTH['TO_MOON']
+        trajectory[3:6] /= GLOBALS.LUNAR['T_ORBIT']
+        return trajectory
+
+    def barycenter_lunar_inertial_to_barycenter_fixed_batch(self, trajectory=None):
+        ''' Inertial barycenter lunar origin frame (SI units) to rotating barycenter frame (normalized) '''
+        trajectory = self._rotate_batch(trajectory, transpose=True)
+        trajectory /= GLOBALS.EARTH['TO_MOON']
+        trajectory[0] += 1
+        trajectory[3:6] *= GLOBALS.LUNAR['T_ORBIT']
+        return trajectory
 
-        relative_frame_angle = math.atan2(y_barycenter, x_barycenter)
+    def barycenter_fixed_to_barycenter_earth_inertial_batch(self, trajectory=None):
+        ''' Rotating barycenter frame (normalized) to inertial barycenter Earth origin frame (SI units) '''
+        trajectory = self._rotate_batch(trajectory)
+        trajectory *= GLOBALS.EARTH['TO_MOON']
+        trajectory[3:6] /= GLOBALS.LUNAR['T_ORBIT']
+        return trajectory
 
-        FBY2BYI = self._fixed_rotation(relative_frame_angle)
+    def barycenter_earth_inertial_to_barycenter_fixed_batch(self, trajectory=None):
+        ''' Inertial barycenter Earth origin frame (SI units) to rotating barycenter frame (normalized) '''
+        trajectory = self._rotate_batch(trajectory, transpose=True)
+        trajectory /= GLOBALS.EARTH['TO_MOON']
+        trajectory[3:6] *= GLOBALS.LUNAR['T_ORBIT']
+        return trajectory
 
-        state_vector = numpy.matmul(FBY2BYI, state_vector)
-        state_vector = state_vector*GLOBALS.EARTH['TO_MOON']
-        state_vector[0] = state_vector[0] - GLOBALS.EARTH['TO_MOON']
-        state_vector[3:6] = state_vector[3:6]/GLOBALS.LUNAR['T_ORBIT']
+    def barycenter_fixed_to_barycenter_lunar_inertial(self, state_vector=None):
+        ''' Rotating barycenter frame (normalized) to inertial barycenter lunar origin frame (SI units) '''
         state_vector = numpy.reshape(state_vector, (6,1))
-        return state_vector
+        return self.barycenter_fixed_to_barycenter_lunar_inertial_batch(state_vector)
 
     def barycenter_lunar_inertial_to_barycenter_fixed(self, state_vector=None):
         ''' Inertial barycenter lunar origin frame (SI units) to rotating barycenter frame (normalized) '''
-        x_lunar = state_vector[0]
-        y_lunar = state_vector[1]
-
-        relative_frame_angle = math.atan2(y_lunar, x_lunar)
-
-        FBY2BYI = self._fixed_rotation(relative_frame_angle)
-
-        state_vector = numpy.matmul(FBY2BYI.T, state_vector)
-        state_vector = state_vector/GLOBALS.EARTH['TO_MOON']
-        state_vector[0] = state_vector[0] + 1
-        state_vector[3:6] = state_vector[3:6]*GLOBALS.LUNAR['T_ORBIT']
         state_vector = numpy.reshape(state_vector, (6,1))
-        return state_vector
+        return self.barycenter_lunar_inertial_to_barycenter_fixed_batch(state_vector)
 
     def barycenter_fixed_to_barycenter_earth_inertial(self, state_vector=None):
         ''' Rotating barycenter frame (normalized) to inertial barycenter Earth origin frame (SI units) '''
-        x_barycenter = state_vector[0]
-        y_barycenter = state_vector[1]
-
-        relative_frame_angle = math.atan2(y_barycenter, x_barycenter)
-
-        FBY2BYI = self._fixed_rotation(relative_frame_angle)
-
-        state_vector = numpy.matmul(FBY2BYI, state_vector)
-        state_vector = state_vector*GLOBALS.EARTH['TO_MOON']
-        state_vector[3:6] = state_vector[3:6]/GLOBALS.LUNAR['T_ORBIT']
         state_vector = numpy.reshape(state_vector, (6,1))
-        return state_vector
+        return self.barycenter_fixed_to_barycenter_earth_inertial_batch(state_vector)
 
     def barycenter_earth_inertial_to_barycenter_fixed(self, state_vector=None):
         ''' Inertial barycenter Earth origin frame (SI units) to rotating barycenter frame (normalized) '''
-        x_lunar = state_vector[0]
-        y_lunar = state_vector[1]
-
-        relative_frame_angle = math.atan2(y_lunar, x_lunar)
-
-        FBY2BYI = self._fixed_rotation(relative_frame_angle)
-
-        state_vector = numpy.matmul(FBY2BYI.T, state_vector)
-        state_vector = state_vector/GLOBALS.EARTH['TO_MOON']
-        state_vector[3:6] = state_vector[3:6]*GLOBALS.LUNAR['T_ORBIT']
         state_vector = numpy.reshape(state_vector, (6,1))
-        return state_vector
+        return self.barycenter_earth_inertial_to_barycenter_fixed_batch(state_vector)
@@ -2,9 +2,10 @@ import math
 import numpy
 
 import lib.tools.conversions as convert
+import lib.tools.math_toolbox.interpolation.hermite as hermite
 
 from lib.gnc.lunar.frames import Frames
-from lib.tools.math_toolbox.ode import solver
+from lib.simcore.support.cache import CACHE
 from lib.simcore.support.variables import GLOBALS
 
 
@@ -23,53 +24,97 @@ class Orbit(object):
         time_squared = Kepler.semi_major_axis**3/self.mu
         self.period = 2*math.pi*math.sqrt(time_squared)
 
+        # Ephemeris table (optional)
+        self.ephemeris = None
+        self.ephemeris_error = None
+
     def total_orbital_samples(self):
         ''' Get the total number of orbit samples from the period '''
         return int(self.period+1)
 
-    def pqw_solution(self, n=0):
-        ''' Compute the specified lunar orbit from Kepler parameters starting at the given phase '''
-        revolution = convert.deg2rad(GLOBALS.CONSTANTS['DEGREES_IN_CIRCLE'])
+    def true_anomaly(self, n=0):
+        ''' Compute the true anomaly at the given time(s) starting at the given phase '''
+        e = self.Kepler.eccentricity
         phase = convert.deg2rad(self.phase)
 
-        # Guess at mean anomaly
+        # Mean anomaly for every requested time
+        n = numpy.atleast_1d(numpy.asarray(n, dtype='float'))
         M = (n+phase)*(2*math.pi)/self.period
 
-        # Find the eccentric anomaly
-        eccentric_anomaly = solver.newton_raphson(self.Kepler.mean_anomaly,         \
-                                                df=self.Kepler.mean_anomaly_df,     \
-                                                x=M, e=self.Kepler.eccentricity, M=M)
-
-        # Normalize to a single rotation
-        eccentric_anomaly = eccentric_anomaly - revolution*math.floor(eccentric_anomaly/revolution)
+        # Find the eccentric anomaly (single rotation)
+        eccentric_anomaly = self.Kepler.eccentric_anomaly(M, e)
 
         # Calculate the true anomaly
-        ratio = math.sqrt((1+self.Kepler.eccentricity)/(1-self.Kepler.eccentricity))
-        self.Kepler.true_anomaly = 2*math.atan(ratio*math.tan(eccentric_anomaly/2))
+        ratio = math.sqrt((1+e)/(1-e))
+        return 2*numpy.arctan(ratio*numpy.tan(eccentric_anomaly/2))
 
-        # Perifocal state calculations
-        ratio = (1-self.Kepler.eccentricity**2)/(1+self.Kepler.eccentricity*math.cos(self.Kepler.true_anomaly))
-        r_magnitude = self.Kepler.semi_major_axis*ratio
-
-        r_p = r_magnitude*math.cos(self.Kepler.true_anomaly)
-        r_q = r_magnitude*math.sin(self.Kepler.true_anomaly)
-        r_w = 0
+    def pqw_solution(self, n=0):
+        ''' Compute the specified lunar orbit from Kepler parameters starting at the given phase '''
+        e = self.Kepler.eccentricity
+        a = self.Kepler.semi_major_axis
 
-        ratio = self.mu/(self.Kepler.semi_major_axis*(1-self.Kepler.eccentricity**2))
-        v_p = -math.sqrt(ratio)*math.sin(self.Kepler.true_anomaly)
-        v_q = +math.sqrt(ratio)*(self.Kepler.eccentricity + math.cos(self.Kepler.true_anomaly))
-        v_w = 0
+        # The anomaly is returned rather than stored on the
+        # (possibly shared) Kepler elements, so evaluation is pure
+        true_anomaly = self.true_anomaly(n)
 
-        r_pqw = numpy.array([[r_p], [r_q], [r_w]])
-        v_pqw = numpy.array([[v_p], [v_q], [v_w]])
+        cos_anomaly = numpy.cos(true_anomaly)
+        sin_anomaly = numpy.sin(true_anomaly)
 
-        # Generate the solution set
-        state_vector = numpy.append(r_pqw, v_pqw)
-        state_vector = numpy.reshape(state_vector, (6,1))
+        # Perifocal state calculations
+        state_vector = numpy.zeros((6, true_anomaly.size))
+        r_magnitude = a*(1-e**2)/(1+e*cos_anomaly)
+        state_vector[0] = r_magnitude*cos_anomaly
+        state_vector[1] = r_magnitude*sin_anomaly
+
+        ratio = math.sqrt(self.mu/(a*(1-e**2)))
+        state_vector[3] = -ratio*sin_anomaly
+        state_vector[4] = +ratio*(e + cos_anomaly)
         return state_vector
 
-    def inertial_solution(self, n=0):
-        ''' Compute the inertial solution for the specified orbit '''
+    def kepler_solution(self, n=0):
+        ''' Compute the inertial solution by solving Kepler's equation (6xN for N times) '''
         state_vector = self.pqw_solution(n)
         PQW2BYI = self.Frames.perifocal_to_barycenter_lunar_inertial()
         return numpy.matmul(PQW2BYI, state_vector)
+
+    def build_ephemeris(self, samples=4096):
+        ''' Tabulate one orbit period for interpolated inertial solutions '''
+        step = self.period/samples
+        epochs = step*numpy.arange(samples+1)
+
+        key = CACHE.key(kind='lunar', e=self.Kepler.eccentricity, a=self.Kepler.semi_major_axis, \
+                        i=self.Kepler.inclination, argp=self.Kepler.arg_at_perigee,               \
+                        raan=self.Kepler.raan, phase=self.phase, mu=self.mu, samples=samples)
+        error_key = CACHE.key(kind='lunar_error', table=key)
+
+        # Previously computed tables are memory mapped
+        state_vector = CACHE.load(key)
+        error = CACHE.load(error_key)
+        if state_vector is None or error is None:
+            state_vector = self.kepler_solution(epochs)
+            error = None
+
+        # State derivatives (velocity and two body acceleration)
+        r_magnitude = numpy.linalg.norm(state_vector[0:3], axis=0)
+        state_derivative = numpy.empty(state_vector.shape)
+        state_derivative[0:3] = state_vector[3:6]
+        state_derivative[3:6] = -self.mu*state_vector[0:3]/r_magnitude**3
+
+        self.ephemeris = {'y': state_vector, 'dy': state_derivative, 'h': step, 'periodic': True}
+
+        # Measure the interpolation error bound at the interval
+        # midpoints, where the cubic Hermite error is largest
+        if error is None:
+            midpoints = epochs[:-1] + step/2
+            error = numpy.abs(self.inertial_solution(midpoints) - self.kepler_solution(midpoints))
+            error = numpy.asarray([error[0:3].max(), error[3:6].max()])
+            CACHE.store(key, state_vector)
+            CACHE.store(error_key, error)
+        self.ephemeris_error = [error[0], error[1]]
+        return self.ephemeris_error
+
+    def inertial_solution(self, n=0):
+        ''' Compute the inertial solution for the specified orbit (6xN for N times) '''
+        if self.ephemeris is None:
+            return self.kepler_solution(n)
+        return hermite.uniform_cubic_hermite(n, **self.ephemeris)
@@ -1,4 +1,3 @@
-import math
 import numpy
 
 from lib.tools.generators import euler_313
@@ -16,36 +15,35 @@ class Frames(object):
         # Rotation angle set
         self.phi = (p0, p1, p2)
 
-    def barycenter_lunar_inertial_to_perifocal(self):
-        ''' Inertial barycenter lunar origin frame to perifocal PQW frame '''
-        R = euler_313(self.phi).T
+        # The orbit orientation is constant, so the
+        # frame rotations are only generated once
+        R = euler_313(self.phi)
         # Each partition is 3x3 so matrix is 6x6
-        # BYI2PQW = | R      ZEROS |
+        # PQW2BYI = | R      ZEROS |
         #           | ZEROS  R     |
-        BYI2PQW = numpy.zeros((6,6))
-        BYI2PQW[:3,:3] = R
-        BYI2PQW[3:,3:] = R
-        return BYI2PQW
+        self._PQW2BYI = numpy.zeros((6,6))
+        self._PQW2BYI[:3,:3] = R
+        self._PQW2BYI[3:,3:] = R
+        self._BYI2PQW = self._PQW2BYI.T.copy()
+
+    def barycenter_lunar_inertial_to_perifocal(self):
+        ''' Inertial barycenter lunar origin frame to perifocal PQW frame '''
+        return self._BYI2PQW
 
     def perifocal_to_barycenter_lunar_inertial(self):
         ''' Perifocal PQW frame to inertial barycenter lunar origin frame '''
-        R = euler_313(self.phi)
-        # Each partition is 3x3 so matrix is 6x6
-        # PQW2BYI = | R      ZEROS |
-        #           | ZEROS  R     |
-        PQW2BYI = numpy.zeros((6,6))
-        PQW2BYI[:3,:3] = R
-        PQW2BYI[3:,3:] = R
-        return PQW2BYI
+        return self._PQW2BYI
 
     def barycenter_lunar_inertial_to_barycenter_earth_inertial(self, state_vector=None):
         ''' Inertial barycenter lunar origin frame to inertial barycenter Earth origin frame '''
         offset = GLOBALS.EARTH['TO_MOON']
-        state_vector[0,0] = state_vector[0,0] + offset
+        state_vector = numpy.array(state_vector, dtype='float')
+        state_vector[0] = state_vector[0] + offset
         return state_vector
 
     def barycenter_earth_inertial_to_barycenter_lunar_inertial(self, state_vector=None):
         ''' Inertial barycenter Earth origin frame to inertial barycenter lunar origin frame '''
         offset = GLOBALS.EARTH['TO_MOON']
-        state_vector[0,0] = state_vector[0,0] - offset
+        state_vector = numpy.array(state_vector, dtype='float')
+        state_vector[0] = state_vector[0] - offset
         return state_vector
\ No newline at end of file
@@ -1,41 +1,104 @@
 import numpy
+import threading
+
+import lib.tools.math_toolbox.interpolation.hermite as hermite
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _construct(Orbit=None, cycles=1):
+    ''' Compute the halo trajectory and its ephemeris table (inertial lunar frame) '''
+    states = Orbit.get_barycenter_fixed_solution(cycles)
+
+    # The grid divides the corrected period, not Params.step
+    step_in_seconds = states.step*Orbit.Params.period_in_seconds()/Orbit.Params.period
+
+    # The table is closed by the propagated sample at one period
+    inertial_states = Orbit.Frames.barycenter_fixed_to_barycenter_lunar_inertial_batch(states.closed)
+
+    # Central difference slopes across the periodic seam
+    padded = numpy.concatenate((inertial_states[:,-2:-1], inertial_states, inertial_states[:,1:2]), axis=1)
+    slopes = numpy.gradient(padded, step_in_seconds, axis=1)[:,1:-1]
+
+    ephemeris = {'y': inertial_states, 'dy': slopes, 'h': step_in_seconds, 'periodic': True}
+    return [states, ephemeris]
 
 
 class Target(object):
     ''' Generic Relay Target Orbiter '''
 
-    def __init__(self, Orbit=None):
+    EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+    def __init__(self, Orbit=None, construction='eager'):
         self._Orbit = Orbit
 
-        # Data to query
-        cycles = Orbit.Params.cycles
-        self.states = self.update_dynamics(cycles)
+        # Data to query (constructed now, on first query,
+        # or in the background on a worker thread/process)
+        self._states = None
+        self._ephemeris = None
+        self._future = None
+        self._lock = threading.Lock()
+
+        if construction == 'eager':
+            self.update_dynamics(Orbit.Params.cycles)
+        elif construction in self.EXECUTORS:
+            executor = self.EXECUTORS[construction](max_workers=1)
+            self._future = executor.submit(_construct, Orbit, Orbit.Params.cycles)
+            executor.shutdown(wait=False)
+        elif construction != 'lazy':
+            raise ValueError("construction must be 'eager', 'lazy', 'thread' or 'process'")
 
         # Required to 'hold' satellite
         self._sample = None
 
+    @property
+    def states(self):
+        ''' Halo trajectory (barycentric frame), blocks until constructed '''
+        self._wait()
+        return self._states
+
+    @property
+    def ephemeris(self):
+        ''' Halo ephemeris table (inertial lunar frame), blocks until constructed '''
+        self._wait()
+        return self._ephemeris
+
+    def _wait(self):
+        ''' Finish the construction of the trajectory if required '''
+        if self._states is not None:
+            return
+
+        # Concurrent first queries construct the trajectory once
+        with self._lock:
+            if self._states is not None:
+                return
+            if self._future is not None:
+                [states, self._ephemeris] = self._future.result()
+            else:
+                [states, self._ephemeris] = _construct(self._Orbit, self._Orbit.Params.cycles)
+
+            # Published last, readers outside the lock check _states
+            self._states = states
+            self._future = None
+        return
+
+    def is_ready(self):
+        ''' Check if the trajectory can be queried without blocking '''
+        return self._states is not None or (self._future is not None and self._future.done())
+
     def query_states(self, tspan=(0,1)):
-        ''' Convert to a common reference time and query state '''
-        state_subspace = numpy.empty((6,0))
-        
-        step = self._Orbit.Params.step
-        step_in_seconds = step*self._Orbit.Params.period_in_seconds()/self._Orbit.Params.period
-
-        n_current = int(1+tspan[0]/step_in_seconds)
-        n_future = int(1+tspan[-1]/step_in_seconds)
-        nspan = (n_current, n_future)
-        
-        for n in nspan:        
-            try:
-                state = self._Orbit.Frames.barycenter_fixed_to_barycenter_lunar_inertial(self.states[:,n])
-            except IndexError:
-                total_samples_per_cycle = self._Orbit.Params.total_samples()
-                n = n % total_samples_per_cycle
-                state = self._Orbit.Frames.barycenter_fixed_to_barycenter_lunar_inertial(self.states[:,n])
-            state_subspace = numpy.append(state_subspace, state, axis=1)
-        return state_subspace
+        ''' Query the state (inertial lunar frame) at the start and end of tspan '''
+        return self.query(numpy.asarray([tspan[0], tspan[-1]], dtype='float'))
+
+    def query(self, t=0):
+        ''' Interpolate the state (inertial lunar frame) at time(s) t in seconds '''
+        return hermite.uniform_cubic_hermite(t, **self.ephemeris)
 
     def update_dynamics(self, cycles=1):
         ''' Update the vehicle dynamics '''
-        return self._Orbit.get_barycenter_fixed_solution(cycles)
-        
\ No newline at end of file
+        [states, ephemeris] = _construct(self._Orbit, cycles)
+        with self._lock:
+            self._ephemeris = ephemeris
+            self._states = states
+        return states
@@ -2,8 +2,9 @@ import numpy
 
 from lib.tools.conversions import mrp2dcm
 from lib.tools.conversions import deg2rad
-from lib.tools.math_toolbox.ode import solver
+from lib.tools.math_toolbox.integration.propagators import RigidBodyMRP
 from lib.gnc.control.pointing import Pointing
+from lib.gnc.control.context import StepContext
 from lib.gnc.control.controller import Controller
 
 
@@ -49,55 +50,39 @@ class Satellite(Vehicle):
         self._control_enabled = True
 
         # Initial configuration
-        self._Controller._moi = self.moments
+        self._Controller.configure(moi=self.moments)
+        self._Propagator = RigidBodyMRP(self.moments)
 
-    def _normalize_attitude(self, vehicle_state=None):
-        ''' Check the MRPs for shadow set '''
-        attitude = vehicle_state[0:3]
+        # Orbit lookups are served from the ephemeris table
+        if Orbit is not None and Orbit.ephemeris is None:
+            Orbit.build_ephemeris()
 
-        # Shadow set check
-        norm_s = numpy.linalg.norm(attitude)
-        if norm_s > 1:
-            attitude = -attitude/norm_s**2
-            vehicle_state[0:3] = attitude
-        return numpy.reshape(vehicle_state, (6,1))
-
-    def _configure_antenna(self, **kwargs):
+    def _configure_antenna(self, context=None):
         ''' Configure the vehicle for communication '''
         # Update the antenna span
         antenna_span = self._antenna_span
-        delta_angle = self._Pointing.relay.update_span(**kwargs)
+        delta_angle = self._Pointing.relay.update_span(context)
 
         # Check if vehicle is in range
         if (delta_angle < antenna_span):
             self._Controller.set_pointing(self._Pointing.relay)
         return
 
-    def _issue_control_command(self, n=0, **kwargs):
-        ''' Issue a control command '''
-        # Calculate transition points
-        vector_norm = numpy.linalg.norm(kwargs['orbit'])
-        e = self._Pointing.Orbit.Kepler.eccentricity
-        a = self._Pointing.Orbit.Kepler.semi_major_axis
-        transition = a*(1-e**2)/(1+e*numpy.cos(deg2rad(165)))
-
+    def _issue_control_command(self, context=None, mode='nadir'):
+        ''' Issue a control command for the active timeline mode '''
         # Primary operational modes
-        transition_parameter = vector_norm < transition
-        if kwargs['orbit'][0] <= 0 and transition_parameter:
+        if mode == 'sun':
             self._Controller.set_pointing(self._Pointing.sun)
         else:
             self._Controller.set_pointing(self._Pointing.nadir)
 
             # Verify vehicle tracking (relay mode)
-            if self._Target is not None and transition_parameter:
-                kwargs['nspan'] = (n,n+1)
-                kwargs['local'] = self._Pointing.get_state_range(**kwargs)
-                kwargs['target'] = self._Pointing.relay.track(self._Target, **kwargs)
-                self._configure_antenna(**kwargs)
+            if mode == 'relay':
+                self._configure_antenna(context)
         
-        if not (n % self._Controller._tau): # Update every second
-            kwargs['control_torque'] = self._Controller.get_control_torque(**kwargs)
-        return kwargs
+        if not (context.n % self._Controller._tau): # Update every second
+            context.control_torque = self._Controller.get_control_torque(context)
+        return context.control_torque
     
     def toggle_control(self):
         ''' Toggle the controller '''
@@ -110,38 +95,65 @@ class Satellite(Vehicle):
         self._antenna_span = deg2rad(los)
         return
 
-    def update_dynamics(self, dt=(0,1), **kwargs):
-        ''' Get the state trajectory with body rates (inertial lunar frame) '''
+    def update_dynamics(self, dt=(0,1), record_every=1, integrator='rk4', **kwargs):
+        ''' Get the state trajectory with body rates (inertial lunar frame),
+            recording every record_every-th integration step. The 'rosenbrock'
+            integrator treats the PD control law implicitly (large steps) '''
         step_size = kwargs['delta']
         vehicle_body_state = numpy.append(self.mrp, self.rates, axis=0)
 
         # Initialize required conditions
-        kwargs['moments'] = self.moments
-        kwargs['control_torque'] = numpy.zeros((6,1))
+        control_torque = numpy.zeros((6,1))
         
         # Configure timing
         tspan = dt[-1]-dt[0]
-        delta = (0,step_size)
         samples = int(1+tspan/step_size)
 
         # Set the controller signal decay time
-        self._Controller._tau = int(1/step_size)
+        self._Controller.configure(tau=max(1, int(1/step_size)))
+
+        # Control law linearization for the semi-implicit integrator
+        feedback = None
+        if integrator == 'rosenbrock' and self._control_enabled:
+            feedback = self._Controller.get_feedback_jacobian()
+        elif integrator not in ('rk4', 'rosenbrock'):
+            raise ValueError("integrator must be 'rk4' or 'rosenbrock'")
+
+        if record_every < 1:
+            raise ValueError("record_every must be at least 1")
         
-        # Vehicle state history and generation
-        vehicle_state_history = vehicle_body_state
+        # Vehicle state history (initial state and every recorded step)
+        vehicle_state_history = numpy.empty((6, 1+samples//record_every))
+        vehicle_state_history[:,[0]] = vehicle_body_state
+
+        # Mode timeline (depends on the orbit only)
+        sample_times = step_size*numpy.arange(samples)
+        [mode_times, modes] = self._Pointing.build_timeline(sample_times, self._Target is not None)
+        interval = 0
 
         for n in range(samples):
-            kwargs['state'] = vehicle_body_state
-            kwargs['orbit'] = self._Pointing.Orbit.inertial_solution(n*step_size)
+            # Orbit, frame and relay quantities are shared for the step
+            context = StepContext(n, step_size, vehicle_body_state, self._Pointing, self._Target, control_torque)
 
-            if self._control_enabled:
-                kwargs = self._issue_control_command(n, **kwargs)
+            # Active mode interval lookup
+            while interval+1 < len(mode_times) and sample_times[n] >= mode_times[interval+1]:
+                interval += 1
 
-            # Integrate body dynamics
-            [_,states] = solver.ode45v(tspan=(0,step_size), **kwargs)
-            vehicle_body_state = self._normalize_attitude(states[:,-1])
+            if self._control_enabled:
+                control_torque = self._issue_control_command(context, modes[interval])
+
+            # Integrate body dynamics (shadow set switch included). The
+            # control law is only linearized about the current state on
+            # steps where the torque was just computed, a held torque is
+            # integrated as is
+            if integrator == 'rosenbrock':
+                step_feedback = feedback if not (n % self._Controller._tau) else None
+                vehicle_body_state = self._Propagator.rosenbrock_step(vehicle_body_state, step_size, \
+                                                                      control_torque, step_feedback)
+            else:
+                vehicle_body_state = self._Propagator.step(vehicle_body_state, step_size, control_torque)
 
             # Update vehicle state history
-            kwargs['state'] = vehicle_body_state
-            vehicle_state_history = numpy.append(vehicle_state_history, vehicle_body_state, axis=1)
+            if not (n+1) % record_every:
+                vehicle_state_history[:,[(n+1)//record_every]] = vehicle_body_state
         return vehicle_state_history
\ No newline at end of file
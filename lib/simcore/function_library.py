@@ -5,6 +5,12 @@ def feval(fhandle=None, **kwargs):
     return fhandle(**kwargs)
 
 
+def inplace(fhandle=None):
+    ''' Mark fhandle as an in-place integrand fhandle(t, y, out, params) '''
+    fhandle.inplace = True
+    return fhandle
+
+
 def axisEqual3D(ax):
     ''' Auto correct the 3D axis aspect ratio '''
     # Source: https://stackoverflow.com/questions/8130823/set-matplotlib-3d-plot-aspect-ratio
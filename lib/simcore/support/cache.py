@@ -0,0 +1,150 @@
+import os
+import ast
+import json
+import numpy
+import hashlib
+import tempfile
+
+from lib.simcore.support.variables import GLOBALS
+
+
+def _module_path(root=None, name=None):
+    ''' Source file of a lib module or package (None for attributes) '''
+    path = os.path.join(root, *name.split('.'))
+    for candidate in (path + '.py', os.path.join(path, '__init__.py')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _lib_imports(path=None):
+    ''' Names of the lib modules (or module attributes) imported by a source file '''
+    with open(path, 'rb') as stream:
+        tree = ast.parse(stream.read(), filename=path)
+
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+            names.extend(node.module + '.' + alias.name for alias in node.names)
+    return [name for name in names if name.split('.')[0] == 'lib']
+
+
+def source_version(modules=()):
+    ''' Hash the source files of the modules that compute cached entries (and their lib imports) '''
+    # Module names are resolved against the directory holding the lib
+    # package and followed through their imports without importing them
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+    sources = {}
+    pending = list(modules)
+    while pending:
+        path = _module_path(root, pending.pop())
+        if path is None or path in sources:
+            continue
+        sources[path] = os.path.relpath(path, root)
+        pending.extend(_lib_imports(path))
+
+    digest = hashlib.sha256()
+    for path in sorted(sources, key=sources.get):
+        digest.update(sources[path].encode())
+        with open(path, 'rb') as stream:
+            digest.update(stream.read())
+    return digest.hexdigest()
+
+
+class TrajectoryCache(object):
+    ''' Persistent content addressed cache of computed trajectories (.npy) '''
+
+    def __init__(self, directory=None, max_bytes=None, enabled=None):
+        if directory is None:
+            directory = os.environ.get('LUNARMISSION_CACHE_DIR', GLOBALS.CACHE['DIRECTORY'])
+        if max_bytes is None:
+            max_bytes = GLOBALS.CACHE['MAX_BYTES']
+        if enabled is None:
+            enabled = GLOBALS.CACHE['ENABLED'] and os.environ.get('LUNARMISSION_CACHE', '1') != '0'
+
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._version = None
+
+    @property
+    def version(self):
+        ''' Code version of the entries (hash of the numerics sources) '''
+        if self._version is None:
+            self._version = source_version(GLOBALS.CACHE['SOURCES'])
+        return self._version
+
+    def key(self, **parameters):
+        ''' Hash the parameters (and code version) that define a trajectory '''
+        parameters['version'] = self.version
+        text = json.dumps(parameters, sort_keys=True, default=lambda x: numpy.asarray(x).tolist())
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _path(self, key=None):
+        ''' File location of a cache entry '''
+        return os.path.join(self.directory, key + '.npy')
+
+    def load(self, key=None):
+        ''' Memory map a cached trajectory (None on a miss) '''
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            values = numpy.load(path, mmap_mode='r')
+            # Touch the entry for least recently used eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return values
+
+    def store(self, key=None, values=None):
+        ''' Save a trajectory and evict the least recently used entries '''
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            # Write then rename, so concurrent readers never see partial files
+            [handle, temporary] = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(handle, 'wb') as stream:
+                numpy.save(stream, numpy.asarray(values))
+            os.replace(temporary, self._path(key))
+            self.evict()
+        except OSError:
+            return
+        return
+
+    def evict(self):
+        ''' Remove the least recently used entries above the size limit '''
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_bytes = sum(entry[1] for entry in entries)
+        for (_, size, name) in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total_bytes -= size
+        return
+
+    def clear(self):
+        ''' Remove all entries '''
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.directory, name))
+        return
+
+
+# Shared cache used by the orbit classes
+CACHE = TrajectoryCache()
@@ -1,119 +1,229 @@
-import math
+import numpy
 
 from lib.simcore.support.variables import GLOBALS
-from lib.simcore.support.exceptions import Verify
 from lib.simcore.support.exceptions import VectorIndexError
 from lib.simcore.support.exceptions import ReferenceFrameError
 
-class Parameter(object):
-    ''' Basic parameter type '''
-    def __init__(self, value=0):
-        self.ic = value
-        self.ts = [value]
-        return
+class TimeSeries(object):
+    ''' Growable array backed time series (one column per sample) '''
+    __slots__ = ('_buffer', '_size', 'frame')
 
+    def __init__(self, values=0, frame=None, capacity=16):
+        values = numpy.asarray(values, dtype=float)
+        if values.ndim < 2:
+            values = values.reshape(-1, 1)
 
-class Vector(object):
-    ''' Vector data type '''
-    def __init__(self, values=[0,0,0], frame=None):
-        self.n = 0
+        [rows, size] = values.shape
+        self._buffer = numpy.empty((rows, max(capacity, size)))
+        self._buffer[:, :size] = values
+        self._size = size
         self.frame = frame
+        return
+
+    @property
+    def values(self):
+        ''' Zero-copy view of the stored samples '''
+        return self._buffer[:, :self._size]
+
+    @property
+    def shape(self):
+        ''' Shape of the stored samples (rows, samples) '''
+        return (self._buffer.shape[0], self._size)
+
+    def __len__(self):
+        ''' Number of stored samples '''
+        return self._size
+
+    def __array__(self, dtype=None, copy=None):
+        ''' Expose the stored samples to numpy '''
+        return self.values.astype(dtype or float, copy=bool(copy))
+
+    def __getitem__(self, key=None):
+        ''' Index the stored samples (basic indexing returns views) '''
+        return self.values[key]
+
+    def _operand(self, other=None):
+        ''' Resolve the array operand of a binary operation '''
+        if isinstance(other, TimeSeries):
+            if self.frame != other.frame:
+                raise ReferenceFrameError
+            return other.values
+        other = numpy.asarray(other, dtype=float)
+        if other.ndim == 1:
+            other = other.reshape(-1, 1)
+        return other
+
+    def _wrap(self, values=None):
+        ''' Wrap a result array in the type of self '''
+        return type(self)(values, self.frame, capacity=0)
+
+    def __add__(self, other=None):
+        ''' Element-wise addition over the whole time axis '''
+        return self._wrap(self.values + self._operand(other))
+
+    def __sub__(self, other=None):
+        ''' Element-wise subtraction over the whole time axis '''
+        return self._wrap(self.values - self._operand(other))
+
+    __radd__ = __add__
+
+    def __rsub__(self, other=None):
+        ''' Reflected element-wise subtraction '''
+        return self._wrap(self._operand(other) - self.values)
 
-        self.i = Parameter(values[0])
-        self.j = Parameter(values[1])
-        self.k = Parameter(values[2])
+    def __neg__(self):
+        ''' Element-wise negation '''
+        return self._wrap(-self.values)
+
+    def append(self, sample=0):
+        ''' Append a single sample (amortized O(1)) '''
+        if self._size == self._buffer.shape[1]:
+            self._grow(self._size + 1)
+        self._buffer[:, self._size] = sample
+        self._size += 1
         return
 
-    def __mul__(self, other=None):
-        ''' Vector inner (dot) product '''
-        if not isinstance(other, Vector):
-            raise TypeError
-        if self.frame is not other.frame:
-            raise ReferenceFrameError
-        
-        other.n = self.n
-        ii = self.i.ts[self.n]*other.i.ts[other.n]
-        jj = self.j.ts[self.n]*other.j.ts[other.n]
-        kk = self.k.ts[self.n]*other.k.ts[other.n]
-        return ii + jj + kk
+    def _grow(self, size=0):
+        ''' Reallocate the buffer by doubling (at least to size) '''
+        buffer = numpy.empty((self._buffer.shape[0], max(size, 2*self._buffer.shape[1])))
+        buffer[:, :self._size] = self.values
+        self._buffer = buffer
+        return
 
-    def __pow__(self, other=None):
-        ''' Vector wedge (cross) product '''
-        if not isinstance(other, Vector):
-            raise TypeError
-        if self.frame is not other.frame:
-            raise ReferenceFrameError
+    def extend(self, samples=None):
+        ''' Append a block of samples (rows, count) '''
+        samples = numpy.asarray(samples, dtype=float)
+        [rows, count] = samples.shape
+        if rows != self._buffer.shape[0]:
+            raise VectorIndexError
 
-        cross = Vector()
-        other.n = self.n
-        cross.n = self.n
-        cross.i = self.j.ts[self.n]*other.k.ts[other.n] - self.k.ts[self.n]*other.j.ts[other.n]
-        cross.j = self.k.ts[self.n]*other.i.ts[other.n] - self.i.ts[self.n]*other.k.ts[other.n]
-        cross.k = self.i.ts[self.n]*other.j.ts[other.n] - self.j.ts[self.n]*other.i.ts[other.n]
-        return cross
+        size = self._size + count
+        if size > self._buffer.shape[1]:
+            self._grow(size)
 
-    def __add__(self, other=None):
-        ''' Vector addition '''
-        if self.frame is not other.frame:
-            raise ReferenceFrameError
+        self._buffer[:, self._size:size] = samples
+        self._size = size
+        return
 
-        vector = Vector()
-        vector.n = self.n
 
-        if not isinstance(other, Vector):
-            if Verify.is_numeric(other):
-                vector.i.ts[vector.n] = self.i.ts[self.n] + other
-                vector.j.ts[vector.n] = self.j.ts[self.n] + other
-                vector.k.ts[vector.n] = self.k.ts[self.n] + other
-            else:
-                raise TypeError
-        else:
-            other.n = self.n
-            vector.i.ts[vector.n] = self.i.ts[self.n] + other.i.ts[other.n]
-            vector.j.ts[vector.n] = self.j.ts[self.n] + other.j.ts[other.n]
-            vector.k.ts[vector.n] = self.k.ts[self.n] + other.k.ts[other.n]
-        return vector
+class Parameter(TimeSeries):
+    ''' Basic (scalar) parameter type '''
+    __slots__ = ()
 
-    def __sub__(self, other=None):
-        ''' Vector subtraction '''
-        if self.frame is not other.frame:
-            raise ReferenceFrameError
+    def __init__(self, value=0, frame=None, capacity=16):
+        TimeSeries.__init__(self, numpy.reshape(value, (1, -1)), frame, capacity)
+        return
+
+    @property
+    def ic(self):
+        ''' Initial value of the parameter '''
+        return self._buffer[0, 0]
 
-        vector = Vector()
-        vector.n = self.n
+    @property
+    def ts(self):
+        ''' Zero-copy view of the parameter history '''
+        return self._buffer[0, :self._size]
 
+
+class Vector(TimeSeries):
+    ''' Vector data type (3 x samples) '''
+    __slots__ = ()
+
+    def __init__(self, values=(0,0,0), frame=None, capacity=16):
+        values = numpy.asarray(values, dtype=float)
+        if values.shape[0] != GLOBALS.CONSTANTS['VECTOR_SIZE']:
+            raise VectorIndexError
+        TimeSeries.__init__(self, values, frame, capacity)
+        return
+
+    @property
+    def i(self):
+        ''' Zero-copy view of the i component history '''
+        return self._buffer[0, :self._size]
+
+    @property
+    def j(self):
+        ''' Zero-copy view of the j component history '''
+        return self._buffer[1, :self._size]
+
+    @property
+    def k(self):
+        ''' Zero-copy view of the k component history '''
+        return self._buffer[2, :self._size]
+
+    def __mul__(self, other=None):
+        ''' Vector inner (dot) product over the whole time axis '''
         if not isinstance(other, Vector):
-            if Verify.is_numeric(other):
-                vector.i.ts[vector.n] = self.i.ts[self.n] - other
-                vector.j.ts[vector.n] = self.j.ts[self.n] - other
-                vector.k.ts[vector.n] = self.k.ts[self.n] - other
-            else:
-                raise TypeError
-        else:
-            other.n = self.n
-            vector.i.ts[vector.n] = self.i.ts[self.n] - other.i.ts[other.n]
-            vector.j.ts[vector.n] = self.j.ts[self.n] - other.j.ts[other.n]
-            vector.k.ts[vector.n] = self.k.ts[self.n] - other.k.ts[other.n]
-        return vector
+            raise TypeError
+        return numpy.einsum('ij,ij->j', *numpy.broadcast_arrays(self.values, self._operand(other)))
+
+    def __pow__(self, other=None):
+        ''' Vector wedge (cross) product over the whole time axis '''
+        if not isinstance(other, Vector):
+            raise TypeError
+        return self._wrap(numpy.cross(self.values, self._operand(other), axis=0))
 
     def norm(self):
-        ''' Calculate the vector norm '''
-        n = self.n
-        return math.sqrt(self.i.ts[n]**2 + self.j.ts[n]**2 + self.k.ts[n]**2)
+        ''' Calculate the vector norm of every sample '''
+        return numpy.sqrt(numpy.einsum('ij,ij->j', self.values, self.values))
 
     def at(self, dn=0):
-        ''' Query the vector values at time dn '''
-        return (self.i.ts[dn],self.j.ts[dn],self.k.ts[dn])
+        ''' Query the vector values at sample dn '''
+        return tuple(self.values[:, dn])
 
-    def update(self, coordinates=[0,0,0]):
+    def update(self, coordinates=(0,0,0)):
         ''' Update the vector time series '''
-        if len(coordinates) > GLOBALS.CONSTANTS['VECTOR_SIZE']:
+        if len(coordinates) != GLOBALS.CONSTANTS['VECTOR_SIZE']:
             raise VectorIndexError
-        self.i.ts.append(coordinates[0])
-        self.j.ts.append(coordinates[1])
-        self.k.ts.append(coordinates[2])
+        self.append(coordinates)
+        return
+
+
+class PeriodicTrajectory(object):
+    ''' Periodic trajectory data type (one stored period) '''
+    def __init__(self, values=None, cycles=1, period=1):
+        # The closing sample (at exactly one period) is kept
+        # apart, the stored period holds samples 0..n-1
+        self.closed = numpy.asarray(values)
+        self.values = self.closed[:, :-1]
+        self.cycles = cycles
+        self.period = period
+
+        # Samples in a single period
+        self.samples = self.values.shape[1]
+        self.step = period/self.samples
+        self.shape = (self.values.shape[0], cycles*self.samples)
+        self.ndim = 2
+        self.dtype = self.values.dtype
         return
 
+    def __len__(self):
+        ''' Number of rows (numpy convention) '''
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        ''' Materialize all cycles on demand '''
+        return numpy.tile(self.values, (1, self.cycles)).astype(dtype or self.dtype, copy=False)
+
+    def __getitem__(self, key=None):
+        ''' Modular indexing over the stored period '''
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        [rows, columns] = key
+
+        if isinstance(columns, slice):
+            columns = numpy.arange(*columns.indices(self.shape[1]))
+        elif numpy.ndim(rows) > 0 and numpy.ndim(columns) > 0:
+            # Two index arrays pair up element-wise (numpy convention)
+            return self.values[rows, numpy.mod(columns, self.samples)]
+
+        # Rows first, so any row key (lists, masks) indexes as in numpy
+        return numpy.take(self.values[rows], numpy.mod(columns, self.samples), axis=-1)
+
+    def at(self, t=0):
+        ''' Query the state nearest to time t '''
+        return self.values[:, int(round((t % self.period)/self.step)) % self.samples]
+
 
 class Satellite(object):
     ''' Generic satellite class '''
@@ -19,4 +19,14 @@ class ReferenceFrameError(Exception):
 class VectorIndexError(Exception):
     def __init__(self):
         Exception.__init__(self, "Vectors are of indices [i, j, k] only.")
+        return
+
+class StepSizeError(Exception):
+    def __init__(self):
+        Exception.__init__(self, "Integration step size fell below the numerical precision.")
+        return
+
+class ConvergenceError(Exception):
+    def __init__(self):
+        Exception.__init__(self, "Iterative solution did not converge within the iteration limit.")
         return
\ No newline at end of file
@@ -36,3 +36,14 @@ class GLOBALS(object):
         'CTRL_TORQUE': [0,0,0],    # Nm
         'SAMPLE_RATE': 1.0,        # Hz
     }
+
+    CACHE = {
+        'ENABLED':   True,          # n/a (LUNARMISSION_CACHE=0 disables)
+        'DIRECTORY': '~/.cache/lunar_mission',
+        'MAX_BYTES': 512*2**20,     # bytes
+        'SOURCES':   [              # n/a (these and their lib imports are hashed into every key)
+            'lib.gnc.kepler',       # passed in as an instance, not imported
+            'lib.gnc.lunar.dynamics',
+            'lib.gnc.libration.dynamics',
+        ],
+    }
\ No newline at end of file
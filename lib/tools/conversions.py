@@ -1,7 +1,7 @@
 import math
 import numpy
 
-from lib.tools.generators import xmat
+from lib.tools.generators import xmat_batch
 
 def deg2rad(angle):
     ''' Degrees to radians '''
@@ -19,25 +19,138 @@ def m2km(dist):
     ''' Meters to kilometers '''
     return dist/1000
 
+def mrp2dcm_batch(MRP):
+    ''' MRP to DCM for stacked (N x 3) MRP sets, giving (N x 3 x 3) '''
+    MRP = numpy.asarray(MRP, dtype='float')
+    S_XMAT = xmat_batch(MRP)
+    norm_squared = numpy.sum(MRP**2, axis=-1)[...,None,None]
+    return numpy.identity(3) + (8*numpy.matmul(S_XMAT,S_XMAT) - 4*(1-norm_squared)*S_XMAT)/(1+norm_squared)**2
+
 def mrp2dcm(MRP):
     ''' MRP to DCM '''
-    S_XMAT = xmat(MRP[:,-1])
-    norm_squared = numpy.linalg.norm(MRP)**2
-    R = numpy.identity(3) + (8*numpy.matmul(S_XMAT,S_XMAT) - 4*(1-norm_squared)*S_XMAT)/(1+norm_squared)**2
-    return numpy.asarray(R)
+    return mrp2dcm_batch(numpy.ravel(MRP)[0:3])
+
+def dcm2mrp_batch(DCM):
+    ''' DCM to MRP for stacked (N x 3 x 3) DCMs, giving (N x 3) '''
+    DCM = numpy.asarray(DCM, dtype='float')
+    trace = numpy.trace(DCM, axis1=-2, axis2=-1)
+
+    C = numpy.sqrt(numpy.maximum(trace+1, 0))
+    singular = numpy.abs(trace+1) < 1e-12
+    C = numpy.where(singular, 1, 1/numpy.where(singular, 1, C*(C+2)))
+
+    mrp = numpy.empty(DCM.shape[:-2] + (3,))
+    mrp[...,0] = C*(DCM[...,1,2]-DCM[...,2,1])
+    mrp[...,1] = C*(DCM[...,2,0]-DCM[...,0,2])
+    mrp[...,2] = C*(DCM[...,0,1]-DCM[...,1,0])
+    return mrp
 
 def dcm2mrp(DCM):
     ''' DCM to MRP '''
-    mrp = numpy.empty((3,1))
-    if abs(numpy.trace(DCM)+1) < 1e-12:
-        C = 1
-    else:
-        C = math.sqrt(numpy.trace(DCM)+1)
-        C = 1/(C*(C+2))
-    mrp[0,0] = C*(DCM[1,2]-DCM[2,1])
-    mrp[1,0] = C*(DCM[2,0]-DCM[0,2])
-    mrp[2,0] = C*(DCM[0,1]-DCM[1,0])
-    return mrp
+    return numpy.reshape(dcm2mrp_batch(DCM), (3,1))
+
+def mrp_shadow_batch(MRP):
+    ''' Switch stacked (N x 3) MRP sets with |s| > 1 to their shadow sets '''
+    MRP = numpy.asarray(MRP, dtype='float')
+    norm_squared = numpy.sum(MRP**2, axis=-1)[...,None]
+    return numpy.where(norm_squared > 1, -MRP/norm_squared, MRP)
+
+def mrp_shadow(MRP):
+    ''' Switch the MRP set to its shadow set if |s| > 1 '''
+    return numpy.reshape(mrp_shadow_batch(numpy.ravel(MRP)[0:3]), numpy.shape(MRP))
+
+def mrp2quat_batch(MRP):
+    ''' MRP to quaternion (scalar first) for stacked (N x 3) MRP sets, giving (N x 4) '''
+    MRP = numpy.asarray(MRP, dtype='float')
+    norm_squared = numpy.sum(MRP**2, axis=-1)[...,None]
+    quaternion = numpy.concatenate((1-norm_squared, 2*MRP), axis=-1)
+    return quaternion/(1+norm_squared)
+
+def mrp2quat(MRP):
+    ''' MRP to quaternion (scalar first) '''
+    return numpy.reshape(mrp2quat_batch(numpy.ravel(MRP)[0:3]), (4,1))
+
+def quat2mrp_batch(quaternion):
+    ''' Quaternion (scalar first) to MRP for stacked (N x 4) quaternions, giving (N x 3), |s| <= 1 '''
+    quaternion = numpy.asarray(quaternion, dtype='float')
+    # q and -q are the same attitude, the positive scalar gives the short rotation
+    quaternion = numpy.where(quaternion[...,[0]] < 0, -quaternion, quaternion)
+    return quaternion[...,1:4]/(1+quaternion[...,[0]])
+
+def quat2mrp(quaternion):
+    ''' Quaternion (scalar first) to MRP '''
+    return numpy.reshape(quat2mrp_batch(numpy.ravel(quaternion)[0:4]), (3,1))
+
+def quat2dcm_batch(quaternion):
+    ''' Quaternion (scalar first) to DCM for stacked (N x 4) quaternions, giving (N x 3 x 3) '''
+    quaternion = numpy.asarray(quaternion, dtype='float')
+    [q0, q1, q2, q3] = numpy.moveaxis(quaternion, -1, 0)
+
+    DCM = numpy.empty(quaternion.shape[:-1] + (3,3))
+    DCM[...,0,0] = q0*q0 + q1*q1 - q2*q2 - q3*q3
+    DCM[...,0,1] = 2*(q1*q2 + q0*q3)
+    DCM[...,0,2] = 2*(q1*q3 - q0*q2)
+    DCM[...,1,0] = 2*(q1*q2 - q0*q3)
+    DCM[...,1,1] = q0*q0 - q1*q1 + q2*q2 - q3*q3
+    DCM[...,1,2] = 2*(q2*q3 + q0*q1)
+    DCM[...,2,0] = 2*(q1*q3 + q0*q2)
+    DCM[...,2,1] = 2*(q2*q3 - q0*q1)
+    DCM[...,2,2] = q0*q0 - q1*q1 - q2*q2 + q3*q3
+    return DCM
+
+def quat2dcm(quaternion):
+    ''' Quaternion (scalar first) to DCM '''
+    return quat2dcm_batch(numpy.ravel(quaternion)[0:4])
+
+def dcm2quat_batch(DCM):
+    ''' DCM to quaternion (scalar first) for stacked (N x 3 x 3) DCMs, giving (N x 4) '''
+    DCM = numpy.asarray(DCM, dtype='float')
+    trace = numpy.trace(DCM, axis1=-2, axis2=-1)
+
+    # Sheppard's method, divide by the largest component
+    squared = numpy.stack((1+trace,                         \
+                           1+2*DCM[...,0,0]-trace,          \
+                           1+2*DCM[...,1,1]-trace,          \
+                           1+2*DCM[...,2,2]-trace), axis=-1)/4
+    largest = numpy.argmax(squared, axis=-1)
+
+    # Products q_i*q_j (times four) from the DCM elements
+    p01 = DCM[...,1,2]-DCM[...,2,1]
+    p02 = DCM[...,2,0]-DCM[...,0,2]
+    p03 = DCM[...,0,1]-DCM[...,1,0]
+    p12 = DCM[...,0,1]+DCM[...,1,0]
+    p13 = DCM[...,2,0]+DCM[...,0,2]
+    p23 = DCM[...,1,2]+DCM[...,2,1]
+    products = numpy.stack((numpy.stack((4*squared[...,0], p01, p02, p03), axis=-1), \
+                            numpy.stack((p01, 4*squared[...,1], p12, p13), axis=-1), \
+                            numpy.stack((p02, p12, 4*squared[...,2], p23), axis=-1), \
+                            numpy.stack((p03, p13, p23, 4*squared[...,3]), axis=-1)), axis=-2)
+
+    row = numpy.take_along_axis(products, largest[...,None,None], axis=-2)[...,0,:]
+    quaternion = row/(4*numpy.sqrt(numpy.take_along_axis(squared, largest[...,None], axis=-1)))
+    return numpy.where(quaternion[...,[0]] < 0, -quaternion, quaternion)
+
+def dcm2quat(DCM):
+    ''' DCM to quaternion (scalar first) '''
+    return numpy.reshape(dcm2quat_batch(DCM), (4,1))
+
+def dcm2euler_313_batch(DCM):
+    ''' DCM (N x 3 x 3) to 313 Euler angles (N x 3, radian) matching euler_313 '''
+    DCM = numpy.asarray(DCM, dtype='float')
+    phi = numpy.empty(DCM.shape[:-2] + (3,))
+    phi[...,0] = numpy.arctan2(DCM[...,2,0], DCM[...,2,1])
+    phi[...,1] = numpy.arccos(numpy.clip(DCM[...,2,2], -1, 1))
+    phi[...,2] = numpy.arctan2(DCM[...,0,2], -DCM[...,1,2])
+    return phi
+
+def dcm2euler_232_batch(DCM):
+    ''' DCM (N x 3 x 3) to 232 Euler angles (N x 3, radian) matching euler_232 '''
+    DCM = numpy.asarray(DCM, dtype='float')
+    phi = numpy.empty(DCM.shape[:-2] + (3,))
+    phi[...,0] = numpy.arctan2(DCM[...,1,2], -DCM[...,1,0])
+    phi[...,1] = numpy.arccos(numpy.clip(DCM[...,1,1], -1, 1))
+    phi[...,2] = numpy.arctan2(DCM[...,2,1], DCM[...,0,1])
+    return phi
 
 def unit_vector(v):
     ''' Convert to unit vector '''
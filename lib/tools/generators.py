@@ -1,12 +1,13 @@
-import math
 import numpy
 
 
 def gmat(r, mu):
     ''' Generate the matrix G that represents the orbital gravitation as a function of position '''
+    # Positions may be stacked as columns, giving a (3x3xN) set of matrices
+    r = numpy.asarray(r)
 
-    r1_norm = math.sqrt((r[0]+mu)**2 + r[1]**2 + r[2]**2)
-    r2_norm = math.sqrt((r[0]-(1-mu))**2 + r[1]**2 + r[2]**2)
+    r1_norm = numpy.sqrt((r[0]+mu)**2 + r[1]**2 + r[2]**2)
+    r2_norm = numpy.sqrt((r[0]-(1-mu))**2 + r[1]**2 + r[2]**2)
 
     u11 = 1 - (1-mu)*(1/r1_norm**3 - 3*(r[0]+mu)**2/r1_norm**5) - mu*(1/r2_norm**3 - 3*(r[0] - (1-mu))**2/r2_norm**5)
     u22 = 1 - (1-mu)*(1/r1_norm**3 - 3*r[1]**2/r1_norm**5) - mu*(1/r2_norm**3 - 3*r[1]**2/r2_norm**5)
@@ -24,33 +25,62 @@ def gmat(r, mu):
     gmat = numpy.array([[u11,u12,u13], [u21,u22,u23], [u31,u32,u33]])
     return gmat
 
+def xmat_batch(s):
+    ''' Generate the matrices X (N x 3 x 3) that represent cross products from stacked s (N x 3) '''
+    s = numpy.asarray(s, dtype='float')
+    xmat = numpy.zeros(s.shape[:-1] + (3,3))
+    xmat[...,0,1] = -s[...,2]
+    xmat[...,0,2] = +s[...,1]
+    xmat[...,1,0] = +s[...,2]
+    xmat[...,1,2] = -s[...,0]
+    xmat[...,2,0] = -s[...,1]
+    xmat[...,2,1] = +s[...,0]
+    return xmat
+
 def xmat(s):
     ''' Generate the matrix X that represents a cross product from s '''
-    xmat = numpy.array([[0, -s[2], s[1]], [s[2], 0, -s[0]], [-s[1], s[0], 0]])
-    return xmat
+    return xmat_batch(numpy.ravel(s)[0:3])
+
+def euler_313_batch(phi):
+    ''' Generate the 313 rotation sequences (N x 3 x 3) for stacked angles (N x 3, radian) '''
+    phi = numpy.asarray(phi, dtype='float')
+    [c0, c1, c2] = numpy.moveaxis(numpy.cos(phi), -1, 0)
+    [s0, s1, s2] = numpy.moveaxis(numpy.sin(phi), -1, 0)
+
+    R = numpy.empty(phi.shape[:-1] + (3,3))
+    R[...,0,0] = c2*c0 - s2*c1*s0
+    R[...,0,1] = -c2*s0 - s2*c1*c0
+    R[...,0,2] = s2*s1
+    R[...,1,0] = s2*c0 + c2*c1*s0
+    R[...,1,1] = -s2*s0 + c2*c1*c0
+    R[...,1,2] = -c2*s1
+    R[...,2,0] = s1*s0
+    R[...,2,1] = s1*c0
+    R[...,2,2] = c1
+    return R
 
 def euler_313(phi):
     ''' Generate the 313 rotation sequence (angles must be radian) '''
-    r11 = math.cos(phi[2])*math.cos(phi[0]) - math.sin(phi[2])*math.cos(phi[1])*math.sin(phi[0])
-    r12 = -math.cos(phi[2])*math.sin(phi[0]) - math.sin(phi[2])*math.cos(phi[1])*math.cos(phi[0])
-    r13 = math.sin(phi[2])*math.sin(phi[1])
-    r21 = math.sin(phi[2])*math.cos(phi[0]) + math.cos(phi[2])*math.cos(phi[1])*math.sin(phi[0])
-    r22 = -math.sin(phi[2])*math.sin(phi[0]) + math.cos(phi[2])*math.cos(phi[1])*math.cos(phi[0])
-    r23 = -math.cos(phi[2])*math.sin(phi[1])
-    r31 = math.sin(phi[1])*math.sin(phi[0])
-    r32 = math.sin(phi[1])*math.cos(phi[0])
-    r33 = math.cos(phi[1])
-    return numpy.asarray([[r11, r12, r13], [r21, r22, r23], [r31, r32, r33]])
+    return euler_313_batch(numpy.ravel(phi)[0:3])
+
+def euler_232_batch(phi):
+    ''' Generate the 232 rotation sequences (N x 3 x 3) for stacked angles (N x 3, radian) '''
+    phi = numpy.asarray(phi, dtype='float')
+    [c0, c1, c2] = numpy.moveaxis(numpy.cos(phi), -1, 0)
+    [s0, s1, s2] = numpy.moveaxis(numpy.sin(phi), -1, 0)
+
+    R = numpy.empty(phi.shape[:-1] + (3,3))
+    R[...,0,0] = c2*c1*c0 - s2*s0
+    R[...,0,1] = c2*s1
+    R[...,0,2] = -s2*c0 - c2*c1*s0
+    R[...,1,0] = -s1*c0
+    R[...,1,1] = c1
+    R[...,1,2] = s1*s0
+    R[...,2,0] = c2*s0 + s2*c1*c0
+    R[...,2,1] = s2*s1
+    R[...,2,2] = c2*c0 - s2*c1*s0
+    return R
 
 def euler_232(phi):
     ''' Generate the 232 rotation sequence (angles must be radian) '''
-    r11 = math.cos(phi[2])*math.cos(phi[1])*math.cos(phi[0]) - math.sin(phi[2])*math.sin(phi[0])
-    r12 = math.cos(phi[2])*math.sin(phi[1])
-    r13 = -math.sin(phi[2])*math.cos(phi[0]) - math.cos(phi[2])*math.cos(phi[1])*math.sin(phi[0])
-    r21 = -math.sin(phi[1])*math.cos(phi[0])
-    r22 = math.cos(phi[1])
-    r23 = math.sin(phi[1])*math.sin(phi[0])
-    r31 = math.cos(phi[2])*math.sin(phi[0]) + math.sin(phi[2])*math.cos(phi[1])*math.cos(phi[0])
-    r32 = math.sin(phi[2])*math.sin(phi[1])
-    r33 = math.cos(phi[2])*math.cos(phi[0]) - math.sin(phi[2])*math.cos(phi[1])*math.sin(phi[0])
-    return numpy.asarray([[r11, r12, r13], [r21, r22, r23], [r31, r32, r33]])
\ No newline at end of file
+    return euler_232_batch(numpy.ravel(phi)[0:3])
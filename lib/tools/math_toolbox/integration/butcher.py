@@ -0,0 +1,61 @@
+import numpy
+
+# Butcher tableaus for the embedded Runge-Kutta integrators
+#
+#   c     nodes (fraction of the step for each stage)
+#   a     stage coefficients (lower triangular)
+#   b     propagated solution weights
+#   e     error estimate weights (b - b_embedded)
+#   order order of the error estimate (lower order of the pair)
+#   fsal  last stage is the derivative at the new solution
+#   dense continuous extension coefficients (None for Hermite)
+
+# Dormand & Prince 5(4), Hairer, Norsett & Wanner (1993) II.5
+DOPRI45 = {
+    'c': numpy.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1]),
+    'a': numpy.array([[0, 0, 0, 0, 0, 0, 0],
+                      [1/5, 0, 0, 0, 0, 0, 0],
+                      [3/40, 9/40, 0, 0, 0, 0, 0],
+                      [44/45, -56/15, 32/9, 0, 0, 0, 0],
+                      [19372/6561, -25360/2187, 64448/6561, -212/729, 0, 0, 0],
+                      [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656, 0, 0],
+                      [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0]]),
+    'b': numpy.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0]),
+    'e': numpy.array([-71/57600, 0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40]),
+    'order': 4,
+    'fsal': True,
+
+    # Shampine (1986) 4th order continuous extension, the interpolant
+    # is y + h*K^T*(dense*[theta, theta^2, theta^3, theta^4])
+    'dense': numpy.array([[1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+                          [0, 0, 0, 0],
+                          [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+                          [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+                          [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+                          [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+                          [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]]),
+}
+
+
+# Fehlberg 7(8), NASA TR R-287 (1968), propagating the 8th order solution
+RKF78 = {
+    'c': numpy.array([0, 2/27, 1/9, 1/6, 5/12, 1/2, 5/6, 1/6, 2/3, 1/3, 1, 0, 1]),
+    'a': numpy.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                      [2/27, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                      [1/36, 1/12, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                      [1/24, 0, 1/8, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                      [5/12, 0, -25/16, 25/16, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                      [1/20, 0, 0, 1/4, 1/5, 0, 0, 0, 0, 0, 0, 0, 0],
+                      [-25/108, 0, 0, 125/108, -65/27, 125/54, 0, 0, 0, 0, 0, 0, 0],
+                      [31/300, 0, 0, 0, 61/225, -2/9, 13/900, 0, 0, 0, 0, 0, 0],
+                      [2, 0, 0, -53/6, 704/45, -107/9, 67/90, 3, 0, 0, 0, 0, 0],
+                      [-91/108, 0, 0, 23/108, -976/135, 311/54, -19/60, 17/6, -1/12, 0, 0, 0, 0],
+                      [2383/4100, 0, 0, -341/164, 4496/1025, -301/82, 2133/4100, 45/82, 45/164, 18/41, 0, 0, 0],
+                      [3/205, 0, 0, 0, 0, -6/41, -3/205, -3/41, 3/41, 6/41, 0, 0, 0],
+                      [-1777/4100, 0, 0, -341/164, 4496/1025, -289/82, 2193/4100, 51/82, 33/164, 12/41, 0, 1, 0]]),
+    'b': numpy.array([0, 0, 0, 0, 0, 34/105, 9/35, 9/35, 9/280, 9/280, 0, 41/840, 41/840]),
+    'e': numpy.array([-41/840, 0, 0, 0, 0, 0, 0, 0, 0, 0, -41/840, 41/840, 41/840]),
+    'order': 7,
+    'fsal': False,
+    'dense': None,
+}
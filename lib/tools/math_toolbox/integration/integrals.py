@@ -1,5 +1,139 @@
 import numpy
+
 from lib.simcore.function_library import feval
+from lib.simcore.support.exceptions import StepSizeError
+from lib.tools.math_toolbox.integration import butcher
+
+
+def _columns(y=None):
+    ''' Arrange a state (or an ensemble of states) as (state_size x N) '''
+    y = numpy.asarray(y, dtype='float')
+    return numpy.reshape(y, (y.shape[0], -1))
+
+
+def _allocate(y_initial=None, samples=1):
+    ''' Preallocate the (state_size x N x samples) output buffer '''
+    y_state = numpy.empty(y_initial.shape + (samples,))
+    y_state[:,:,0] = y_initial
+    return y_state
+
+
+def _trajectory(y_state=None, samples=1):
+    ''' Output view of the buffer, a single state drops the ensemble axis '''
+    if y_state.shape[1] == 1:
+        return y_state[:,0,:samples]
+    return y_state[:,:,:samples]
+
+
+def _steps(x_span=None, h=1):
+    ''' Number of whole fixed steps in the span (tolerant to round off) '''
+    # A step that divides the span (h = T/n) must give n steps,
+    # even when T/h rounds to just below n
+    ratio = (x_span[-1] - x_span[0])/h
+    return int(ratio + 8*numpy.finfo(float).eps*max(1, abs(ratio)))
+
+
+def _evaluator(fhandle=None, kwargs=None):
+    ''' Bind the integrand to its parameters as f(x, y, out) '''
+    # In-place integrands take (t, y, out, params) and write the
+    # derivative into out, the parameters are bound once here
+    if getattr(fhandle, 'inplace', False):
+        def evaluate(x, y, out):
+            fhandle(x, y, out, kwargs)
+            return out
+        return evaluate
+
+    # Keyword integrands return the derivative, which is copied into out
+    def evaluate(x, y, out):
+        kwargs['x'] = x
+        kwargs['y'] = y
+        out[...] = feval(fhandle, **kwargs)
+        return out
+    return evaluate
+
+
+def _rk4_step(evaluate=None, x=0, y=None, h=1, K=None, work=None):
+    ''' Single Runge-Kutta (4th order) step from (x, y) using stage buffers K '''
+    [k1, k2, k3, k4] = K
+
+    evaluate(x, y, k1)
+
+    numpy.multiply(k1, h/2, out=work)
+    work += y
+    evaluate(x + h/2, work, k2)
+
+    numpy.multiply(k2, h/2, out=work)
+    work += y
+    evaluate(x + h/2, work, k3)
+
+    numpy.multiply(k3, h, out=work)
+    work += y
+    evaluate(x + h, work, k4)
+
+    return y + (h/6)*(k1 + 2*k2 + 2*k3 + k4)
+
+
+def _hermite(y=None, y_update=None, df=None, df_update=None, h=1, theta=0):
+    ''' Cubic Hermite interpolant from the step end point values and derivatives '''
+    h00 = (1 + 2*theta)*(1 - theta)**2
+    h10 = theta*(1 - theta)**2
+    h01 = theta**2*(3 - 2*theta)
+    h11 = theta**2*(theta - 1)
+    return h00*y + h10*h*df + h01*y_update + h11*h*df_update
+
+
+def _crossed(g=0, g_update=0, direction=0):
+    ''' Check the event function for a zero crossing over a step '''
+    # Starting on the event surface is not a crossing
+    if g == 0 or g*g_update > 0:
+        return False
+    return direction == 0 or direction*(g_update - g) > 0
+
+
+def _locate(event=None, interpolant=None, x=0, h=1, g=0):
+    ''' Locate the event crossing within a step by bisection on the interpolant '''
+    lower = 0.0
+    upper = 1.0
+    while (upper - lower)*abs(h) > 4*numpy.finfo(float).eps*max(1, abs(x)):
+        theta = (lower + upper)/2
+        if event(x + theta*h, interpolant(theta))*g > 0:
+            lower = theta
+        else:
+            upper = theta
+    return [x + upper*h, interpolant(upper)]
+
+
+def _refine(event=None, solution=None, x=0, h=1, g=0, theta=1):
+    ''' Refine an event crossing on the step solution itself (safeguarded secant) '''
+    tolerance = 4*numpy.finfo(float).eps*max(1, abs(x))/abs(h)
+
+    # The crossing stays bracketed, g has its step start sign at lower
+    lower = 0.0
+    upper = 1.0
+    [theta_previous, g_previous] = [None, None]
+
+    for idx in range(64):
+        y = solution(theta)
+        g_theta = event(x + theta*h, y)
+        if g_theta == 0:
+            break
+        if g_theta*g > 0:
+            lower = theta
+        else:
+            upper = theta
+
+        # Secant update, a bisection when it leaves the bracket
+        if theta_previous is None or g_theta == g_previous:
+            [theta_previous, g_previous] = [0.0, g]
+        theta_next = theta - g_theta*(theta - theta_previous)/(g_theta - g_previous)
+        if not lower < theta_next < upper:
+            theta_next = (lower + upper)/2
+
+        if abs(theta_next - theta) <= tolerance or upper - lower <= tolerance:
+            break
+        [theta_previous, g_previous] = [theta, g_theta]
+        theta = theta_next
+    return [x + theta*h, y]
 
 
 def RK4(fhandle=None, **kwargs):
@@ -7,42 +141,39 @@ def RK4(fhandle=None, **kwargs):
     h = kwargs['h']
     
     x_span = kwargs['x']
-    x_delta = int((x_span[-1] - x_span[0])/h)
-    x_initial = x_span[0]
+    x_delta = _steps(x_span, h)
 
-    y_initial = kwargs['y']
-    state_size = len(y_initial)
+    y_update = _columns(kwargs['y'])
+    evaluate = _evaluator(fhandle, kwargs)
 
-    x_update = x_initial
-    y_update = y_initial
-
-    x_state = numpy.asarray([x_update])
-    y_state = numpy.asarray(y_update)
-    
-    for idx in range(x_delta):
-        kwargs['x'] = x_update
-        kwargs['y'] = y_update
-        k1 = feval(fhandle, **kwargs)
-
-        kwargs['x'] = x_update + h/2
-        kwargs['y'] = y_update + k1*(h/2)
-        k2 = feval(fhandle, **kwargs)
+    # Output buffers are sized once, one column per sample
+    x_state = x_span[0] + h*numpy.arange(x_delta+1)
+    y_state = _allocate(y_update, x_delta+1)
 
-        kwargs['x'] = x_update + h/2
-        kwargs['y'] = y_update + k2*(h/2)
-        k3 = feval(fhandle, **kwargs)
+    K = numpy.empty((4,) + y_update.shape)
+    work = numpy.empty(y_update.shape)
 
-        kwargs['x'] = x_update + h
-        kwargs['y'] = y_update + k3*h
-        k4 = feval(fhandle, **kwargs)
+    # Optional terminal event g(x, y) = 0
+    event = kwargs.get('event')
+    event_direction = kwargs.get('event_direction', 0)
+    if event is not None:
+        g_update = event(x_state[0], y_update)
 
-        x_update = x_update + h
-        x_state = numpy.append(x_state, x_update)
+    for idx in range(x_delta):
+        y_previous = y_update
+        y_update = _rk4_step(evaluate, x_state[idx], y_update, h, K, work)
+        y_state[:,:,idx+1] = y_update
 
-        y_update = y_update + (h/6)*(k1 + 2*k2 + 2*k3 + k4)
-        y_state = numpy.append(y_state, y_update, axis=1)
+        if event is not None:
+            g_next = event(x_state[idx+1], y_update)
+            if _crossed(g_update, g_next, event_direction):
+                df_update = evaluate(x_state[idx+1], y_update, numpy.empty(y_update.shape))
+                interpolant = lambda theta: _hermite(y_previous, y_update, K[0], df_update, h, theta)
+                [x_state[idx+1], y_state[:,:,idx+1]] = _locate(event, interpolant, x_state[idx], h, g_update)
+                return [x_state[:idx+2], _trajectory(y_state, idx+2)]
+            g_update = g_next
         
-    return [x_state, y_state]
+    return [x_state, _trajectory(y_state, x_delta+1)]
 
 
 def ABM4(fhandle=None, **kwargs):
@@ -50,49 +181,267 @@ def ABM4(fhandle=None, **kwargs):
     h = kwargs['h']
     
     x_span = kwargs['x']
-    x_delta = int((x_span[-1] - x_span[0])/h)
-    x_initial = [x_span[0] + n*h for n in range(x_delta+1)]
+    x_delta = _steps(x_span, h)
 
-    y_initial = kwargs['y']
-    state_size = len(y_initial)
+    y_update = _columns(kwargs['y'])
+    evaluate = _evaluator(fhandle, kwargs)
 
-    kwargs['x'] = (x_initial[0], x_initial[3])
-    kwargs['y'] = y_initial
+    # Output buffers are sized once, one column per sample
+    x_state = x_span[0] + h*numpy.arange(x_delta+1)
+    y_state = _allocate(y_update, x_delta+1)
 
-    [x_update, y_update] = RK4(fhandle, **kwargs)
-    
-    x_state = numpy.asarray(x_update)
-    y_state = numpy.asarray(y_update)
+    K = numpy.empty((4,) + y_update.shape)
+    work = numpy.empty(y_update.shape)
+
+    # Optional terminal event g(x, y) = 0
+    event = kwargs.get('event')
+    event_direction = kwargs.get('event_direction', 0)
+    if event is not None:
+        g_update = event(x_state[0], y_update)
+
+    # Runge-Kutta start up for the first three samples
+    for idx in range(min(3, x_delta)):
+        y_previous = y_update
+        y_update = _rk4_step(evaluate, x_state[idx], y_update, h, K, work)
+        y_state[:,:,idx+1] = y_update
+
+        if event is not None:
+            g_next = event(x_state[idx+1], y_update)
+            if _crossed(g_update, g_next, event_direction):
+                df_update = evaluate(x_state[idx+1], y_update, numpy.empty(y_update.shape))
+                interpolant = lambda theta: _hermite(y_previous, y_update, K[0], df_update, h, theta)
+                [x_state[idx+1], y_state[:,:,idx+1]] = _locate(event, interpolant, x_state[idx], h, g_update)
+                return [x_state[:idx+2], _trajectory(y_state, idx+2)]
+            g_update = g_next
+
+    # Derivative history (f_n, f_n-1, f_n-2, f_n-3) rolled forward
+    # each step so every sample is only evaluated once (PECE)
+    history = [K[3], K[2], K[1], K[0]]
+    for idx in range(4 if x_delta > 3 else 0):
+        evaluate(x_state[idx], y_state[:,:,idx], history[3-idx])
+
+    df = numpy.empty(y_update.shape)
 
     for idx in range(3, x_delta):
-        kwargs['x'] = x_update[idx]
-        kwargs['y'] = y_update[:,idx]
-        df0 = feval(fhandle, **kwargs)
+        [df0, df1, df2, df3] = history
+
+        # Predict
+        numpy.multiply(df0, 55, out=work)
+        work -= 59*df1
+        work += 37*df2
+        work -= 9*df3
+        work *= h/24
+        work += y_update
+        evaluate(x_state[idx] + h, work, df)
+
+        # Correct
+        y_previous = y_update
+        y_update = y_update + (h/24)*(9*df + 19*df0 - 5*df1 + df2)
+        y_state[:,:,idx+1] = y_update
+
+        if event is not None:
+            g_next = event(x_state[idx+1], y_update)
+            if _crossed(g_update, g_next, event_direction):
+                df_update = evaluate(x_state[idx+1], y_update, df)
+                interpolant = lambda theta: _hermite(y_previous, y_update, df0, df_update, h, theta)
+                [x_state[idx+1], y_state[:,:,idx+1]] = _locate(event, interpolant, x_state[idx], h, g_update)
+                return [x_state[:idx+2], _trajectory(y_state, idx+2)]
+            g_update = g_next
+
+        # Evaluate at the corrected sample for the next step,
+        # the oldest derivative buffer is recycled
+        if idx+1 < x_delta:
+            history = [evaluate(x_state[idx] + h, y_update, df3), df0, df1, df2]
+
+    return [x_state, _trajectory(y_state, x_delta+1)]
+
+
+def _error_norm(error=None, y=None, y_update=None, rtol=1e-6, atol=1e-9):
+    ''' Weighted RMS norm of the local error estimate (worst ensemble member) '''
+    scale = atol + rtol*numpy.maximum(numpy.absolute(y), numpy.absolute(y_update))
+    return numpy.max(numpy.sqrt(numpy.mean((error/scale)**2, axis=0)))
+
+
+def _initial_step(evaluate=None, x=0, y=None, df=None, order=4, rtol=1e-6, atol=1e-9):
+    ''' Starting step size estimate, Hairer, Norsett & Wanner (1993) II.4 '''
+    scale = atol + rtol*numpy.absolute(y)
+    d0 = numpy.sqrt(numpy.mean((y/scale)**2))
+    d1 = numpy.sqrt(numpy.mean((df/scale)**2))
+    h0 = 1e-6 if (d0 < 1e-5 or d1 < 1e-5) else 0.01*d0/d1
+
+    df_trial = evaluate(x + h0, y + h0*df, numpy.empty(y.shape))
+    d2 = numpy.sqrt(numpy.mean(((df_trial - df)/scale)**2))/h0
+
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, 1e-3*h0)
+    else:
+        h1 = (0.01/max(d1, d2))**(1/(order+1))
+    return min(100*h0, h1)
+
+
+def _interpolate(tableau=None, K=None, y=None, y_update=None, h=1, theta=0):
+    ''' Dense output at x + theta*h within an accepted step '''
+    if tableau['dense'] is not None:
+        powers = numpy.cumprod(numpy.full(tableau['dense'].shape[1], theta))
+        weights = numpy.matmul(tableau['dense'], powers)
+        return y + h*numpy.tensordot(weights, K, axes=1)
+
+    # Cubic Hermite from the end point values and derivatives
+    return _hermite(y, y_update, K[0], K[-1], h, theta)
+
+
+def _embedded_step(evaluate=None, tableau=None, x=0, y=None, h=1, K=None, work=None):
+    ''' Single embedded Runge-Kutta step, K[0] must hold the derivative at (x, y) '''
+    c = tableau['c']
+    a = tableau['a']
+
+    # Stage evaluations
+    for idx in range(1, len(c)):
+        work[...] = numpy.tensordot(a[idx,:idx], K[:idx], axes=1)
+        work *= h
+        work += y
+        evaluate(x + c[idx]*h, work, K[idx])
+
+    return y + h*numpy.tensordot(tableau['b'], K, axes=1)
+
+
+def _adaptive(fhandle=None, tableau=None, **kwargs):
+    ''' Embedded Runge-Kutta driver with error control and dense output '''
+    SAFETY = 0.9
+    MIN_FACTOR = 0.2
+    MAX_FACTOR = 5.0
+
+    rtol = kwargs.get('rtol', 1e-6)
+    atol = kwargs.get('atol', 1e-9)
+
+    x_span = kwargs['x']
+    x_initial = x_span[0]
+    x_final = x_span[-1]
+    direction = 1 if x_final >= x_initial else -1
+
+    x_update = x_initial
+    y_update = _columns(kwargs['y'])
+    evaluate = _evaluator(fhandle, kwargs)
+
+    df = evaluate(x_update, y_update, numpy.empty(y_update.shape))
+
+    # Requested output times are served by the interpolant,
+    # otherwise every accepted step is recorded
+    x_output = kwargs.get('xout')
+    if x_output is not None:
+        x_output = numpy.asarray(x_output, dtype='float')
+        x_state = numpy.append(x_output, 0)
+        y_state = _allocate(y_update, len(x_output)+1)
+        samples = 0
+        while samples < len(x_output) and direction*(x_output[samples] - x_initial) <= 0:
+            y_state[:,:,samples] = y_update
+            samples = samples + 1
+    else:
+        x_state = numpy.empty(64)
+        y_state = _allocate(y_update, 64)
+        x_state[0] = x_update
+        samples = 1
+
+    h = kwargs.get('h')
+    if h is None:
+        h = _initial_step(evaluate, x_update, y_update, df, tableau['order'], rtol, atol)
+    h = direction*abs(h)
+
+    e = tableau['e']
+    K = numpy.empty((len(e),) + y_update.shape)
+    work = numpy.empty(y_update.shape)
+    exponent = -1/(tableau['order']+1)
+
+    # Optional terminal event g(x, y) = 0
+    event = kwargs.get('event')
+    event_direction = kwargs.get('event_direction', 0)
+    if event is not None:
+        g_update = event(x_update, y_update)
+
+    while direction*(x_final - x_update) > 0:
+        # Without a continuous extension the steps land on the output times
+        x_limit = x_final
+        if x_output is not None and tableau['dense'] is None and samples < len(x_output):
+            x_limit = x_output[samples]
+
+        if direction*(x_update + h - x_limit) > 0:
+            h = x_limit - x_update
+
+        if abs(h) < 16*numpy.finfo(float).eps*max(1, abs(x_update)):
+            raise StepSizeError
+
+        K[0] = df
+        y_next = _embedded_step(evaluate, tableau, x_update, y_update, h, K, work)
+        error = _error_norm(h*numpy.tensordot(e, K, axes=1), y_update, y_next, rtol, atol)
+
+        if error > 1:
+            h = h*max(MIN_FACTOR, SAFETY*error**exponent)
+            continue
+
+        x_next = x_update + h
+        if tableau['fsal']:
+            df[...] = K[-1]
+        else:
+            evaluate(x_next, y_next, df)
+            K[-1] = df
+
+        # A terminal event ends the integration within the step
+        x_event = None
+        if event is not None:
+            g_next = event(x_next, y_next)
+            if _crossed(g_update, g_next, event_direction):
+                interpolant = lambda theta: _interpolate(tableau, K, y_update, y_next, h, theta)
+                [x_event, y_event] = _locate(event, interpolant, x_update, h, g_update)
+
+                # Without a continuous extension the cubic estimate is
+                # refined on partial steps of the method itself
+                if tableau['dense'] is None:
+                    K_partial = numpy.copy(K)
+                    solution = lambda theta: _embedded_step(evaluate, tableau, x_update, y_update, theta*h, K_partial, work)
+                    [x_event, y_event] = _refine(event, solution, x_update, h, g_update, (x_event - x_update)/h)
+            g_update = g_next
+
+        # Record the accepted step
+        x_record = x_next if x_event is None else x_event
+        if x_output is not None:
+            while samples < len(x_output) and direction*(x_output[samples] - x_record) <= 0:
+                theta = (x_output[samples] - x_update)/h
+                y_state[:,:,samples] = _interpolate(tableau, K, y_update, y_next, h, theta)
+                samples = samples + 1
+        elif x_event is None:
+            if samples == len(x_state):
+                x_state = numpy.resize(x_state, 2*samples)
+                y_state = numpy.concatenate((y_state, numpy.empty(y_state.shape)), axis=2)
+            x_state[samples] = x_next
+            y_state[:,:,samples] = y_next
+            samples = samples + 1
 
-        kwargs['x'] = x_update[idx-1]
-        kwargs['y'] = y_update[:,idx-1]
-        df1 = feval(fhandle, **kwargs)
+        # The event is always the last sample
+        if x_event is not None:
+            if samples == len(x_state):
+                x_state = numpy.resize(x_state, samples+1)
+                y_state = numpy.concatenate((y_state, numpy.empty(y_state.shape[:2] + (1,))), axis=2)
+            x_state[samples] = x_event
+            y_state[:,:,samples] = y_event
+            samples = samples + 1
+            break
 
-        kwargs['x'] = x_update[idx-2]
-        kwargs['y'] = y_update[:,idx-2]
-        df2 = feval(fhandle, **kwargs)
+        x_update = x_next
+        y_update = y_next
 
-        kwargs['x'] = x_update[idx-3]
-        kwargs['y'] = y_update[:,idx-3]
-        df3 = feval(fhandle, **kwargs)
+        if error == 0:
+            h = h*MAX_FACTOR
+        else:
+            h = h*min(MAX_FACTOR, SAFETY*error**exponent)
 
-        kwargs['x'] = x_update[idx] + h
-        kwargs['y'] = y_update[:,idx] + (h/24)*(55*df0 - 59*df1 + 37*df2 - 9*df3)
-        df = feval(fhandle, **kwargs)
+    return [x_state[:samples], _trajectory(y_state, samples)]
 
-        x_update = x_update[idx] + h
-        x_state = numpy.append(x_state, x_update)
 
-        y_update = y_update[:,[idx]] + (h/24)*(9*df + 19*df0 - 5*df1 + df2)
-        y_update = numpy.reshape(y_update, (state_size,1))
-        y_state = numpy.append(y_state, y_update, axis=1)
+def DOPRI45(fhandle=None, **kwargs):
+    ''' Dormand & Prince 5(4) adaptive step numerical integrator '''
+    return _adaptive(fhandle, tableau=butcher.DOPRI45, **kwargs)
 
-        x_update = x_state
-        y_update = y_state
 
-    return [x_state, y_state]
+def RKF78(fhandle=None, **kwargs):
+    ''' Runge-Kutta-Fehlberg 7(8) adaptive step numerical integrator '''
+    return _adaptive(fhandle, tableau=butcher.RKF78, **kwargs)
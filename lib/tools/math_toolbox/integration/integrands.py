@@ -1,8 +1,8 @@
-import math
 import numpy
 
 from lib.tools.generators import gmat
 from lib.tools.generators import xmat
+from lib.simcore.function_library import inplace
 from lib.simcore.support.variables import GLOBALS
 
 class CRTBP(object):
@@ -10,28 +10,29 @@ class CRTBP(object):
     @classmethod
     def vfhandle(cls, **kwargs):
         ''' Function handle (state vector representation) '''
+        # States are columns, an ensemble is evaluated at once
         mu = kwargs['mu']
 
-        state = numpy.empty((0))
-        state = numpy.append(state, kwargs['y'])
+        state = numpy.asarray(kwargs['y'])
+        state = numpy.reshape(state, (6, state.size//6))
 
-        r1_norm = math.sqrt((mu+state[0])**2 + state[1]**2 + state[2]**2)
-        r2_norm = math.sqrt((1-mu-state[0])**2 + state[1]**2 + state[2]**2)
+        r1_norm = numpy.sqrt((mu+state[0])**2 + state[1]**2 + state[2]**2)
+        r2_norm = numpy.sqrt((1-mu-state[0])**2 + state[1]**2 + state[2]**2)
 
         mass1 = 1 - mu
         mass2 = mu
 
         G = 1
 
-        df1 = state[3]
-        df2 = state[4]
-        df3 = state[5]
-        df4 = state[0] + 2*state[4] - G*mass1*(mu+state[0])/r1_norm**3 + G*mass2*(1-mu-state[0])/r2_norm**3
-        df5 = state[1] - 2*state[3] - G*mass1*state[1]/r1_norm**3 - G*mass2*state[1]/r2_norm**3
-        df6 = -G*mass1*state[2]/r1_norm**3 - G*mass2*state[2]/r2_norm**3
-        df = numpy.asarray([[df1, df2, df3, df4, df5, df6]])
+        df = numpy.empty(state.shape)
+        df[0] = state[3]
+        df[1] = state[4]
+        df[2] = state[5]
+        df[3] = state[0] + 2*state[4] - G*mass1*(mu+state[0])/r1_norm**3 + G*mass2*(1-mu-state[0])/r2_norm**3
+        df[4] = state[1] - 2*state[3] - G*mass1*state[1]/r1_norm**3 - G*mass2*state[1]/r2_norm**3
+        df[5] = -G*mass1*state[2]/r1_norm**3 - G*mass2*state[2]/r2_norm**3
 
-        return df.T
+        return df
 
     @classmethod
     def mfhandle(cls, **kwargs):
@@ -39,17 +40,18 @@ class CRTBP(object):
         # This is the ODE A' = dU*A
         mu = kwargs['mu']
 
-        state = numpy.empty((0))
-        state = numpy.append(state, kwargs['y'])
+        state = numpy.asarray(kwargs['y'])
+        state = numpy.reshape(state, (42, state.size//42))
  
         dim_3 = GLOBALS.CONSTANTS['VECTOR_SIZE']
         dim_6 = GLOBALS.CONSTANTS['STATE_VECTOR_DIM']
+        ensemble = state.shape[1]
         
-        # Create partitions
-        O = numpy.zeros((dim_3,dim_3))
-        I = numpy.identity(dim_3)
-        G = gmat(state[36:39], mu)
-        K = numpy.zeros((dim_3,dim_3))
+        # Create partitions (one 3x3 block per ensemble member)
+        O = numpy.zeros((dim_3,dim_3,ensemble))
+        I = numpy.repeat(numpy.identity(dim_3)[:,:,None], ensemble, axis=2)
+        G = numpy.reshape(gmat(state[36:39], mu), (dim_3,dim_3,ensemble))
+        K = numpy.zeros((dim_3,dim_3,ensemble))
 
         K[0,1] = 2
         K[1,0] = -K[0,1]
@@ -57,24 +59,118 @@ class CRTBP(object):
         # Each partition is 3x3 so matrix is 6x6
         # dU = | O  I |
         #      | G  K |
-        dU = numpy.zeros((dim_6,dim_6))
+        dU = numpy.zeros((dim_6,dim_6,ensemble))
         dU[:,:dim_3] = numpy.concatenate((O, G), axis=0)
         dU[:,dim_3:] = numpy.concatenate((I, K), axis=0)
 
         # Build the A matrix from state data (6x6)
-        A = numpy.reshape(state[:dim_6**2], (dim_6,dim_6))
+        A = numpy.reshape(state[:dim_6**2], (dim_6,dim_6,ensemble))
 
         # ODE A' = dU*A
-        dA = numpy.matmul(dU, A)
-        dA = numpy.reshape(dA, (dim_6**2,1))        
+        dA = numpy.einsum('ijn,jkn->ikn', dU, A)
+        dA = numpy.reshape(dA, (dim_6**2,ensemble))
 
         # ODE x' = f(x)
         kwargs['y'] = state[36:]
-        df = numpy.asarray(cls.vfhandle(**kwargs))
+        df = cls.vfhandle(**kwargs)
         dF = numpy.append(dA, df, axis=0)
 
         return dF
 
+    @classmethod
+    @inplace
+    def vfunc(cls, t, y, out, params):
+        ''' In-place function handle (state vector representation) '''
+        mu = params['mu']
+
+        # A single state is unpacked to floats, which is far
+        # cheaper than array arithmetic on one element columns
+        if y.shape[1] == 1:
+            [x1, x2, x3, v1, v2, v3] = y[:,0].tolist()
+        else:
+            [x1, x2, x3, v1, v2, v3] = y
+
+        dx1 = x1 + mu
+        dx2 = x1 - (1-mu)
+        yz_squared = x2*x2 + x3*x3
+
+        # Scaled inverse cube distances (1-mu)/r1^3 and mu/r2^3
+        c1 = (1-mu)/(dx1*dx1 + yz_squared)**1.5
+        c2 = mu/(dx2*dx2 + yz_squared)**1.5
+
+        out[0] = v1
+        out[1] = v2
+        out[2] = v3
+        out[3] = x1 + 2*v2 - c1*dx1 - c2*dx2
+        out[4] = x2 - 2*v1 - (c1+c2)*x2
+        out[5] = -(c1+c2)*x3
+
+    @classmethod
+    @inplace
+    def mfunc(cls, t, y, out, params):
+        ''' In-place function handle (state matrix representation) '''
+        # This is the ODE A' = dU*A with the block structure
+        # dU = | O  I |
+        #      | G  K |
+        # so only G*A[0:3] is a full product. G and the state
+        # derivative share the same distance terms
+        mu = params['mu']
+        ensemble = y.shape[1]
+
+        if y.shape[1] == 1:
+            [x1, x2, x3, v1, v2, v3] = y[36:,0].tolist()
+        else:
+            [x1, x2, x3, v1, v2, v3] = y[36:]
+
+        dx1 = x1 + mu
+        dx2 = x1 - (1-mu)
+        yz_squared = x2*x2 + x3*x3
+        r1_squared = dx1*dx1 + yz_squared
+        r2_squared = dx2*dx2 + yz_squared
+
+        # Scaled inverse distances (1-mu)/r1^3, mu/r2^3, 3(1-mu)/r1^5, 3mu/r2^5
+        c1 = (1-mu)/r1_squared**1.5
+        c2 = mu/r2_squared**1.5
+        d1 = 3*c1/r1_squared
+        d2 = 3*c2/r2_squared
+
+        c12 = c1 + c2
+        d12 = d1 + d2
+        dxd = d1*dx1 + d2*dx2
+
+        # Gravity gradient (symmetric)
+        # Work arrays are kept with the parameters for the integration call
+        G = params.get('stm_gravity')
+        if G is None or G.shape[2] != ensemble:
+            G = params['stm_gravity'] = numpy.empty((3,3,ensemble))
+        G[0,0] = 1 - c12 + d1*dx1*dx1 + d2*dx2*dx2
+        G[1,1] = 1 - c12 + d12*x2*x2
+        G[2,2] = -c12 + d12*x3*x3
+        G[0,1] = G[1,0] = dxd*x2
+        G[0,2] = G[2,0] = dxd*x3
+        G[1,2] = G[2,1] = d12*x2*x3
+
+        A = numpy.reshape(y[:36], (6,6,ensemble))
+        dA = numpy.reshape(out[:36], (6,6,ensemble))
+
+        # dA = | A[3:6]                      |
+        #      | G*A[0:3] + K*A[3:6]         |
+        dA[0:3] = A[3:6]
+        if ensemble == 1:
+            numpy.matmul(G[:,:,0], A[0:3,:,0], out=dA[3:6,:,0])
+        else:
+            dA[3:6] = numpy.einsum('ijn,jkn->ikn', G, A[0:3])
+        dA[3] += 2*A[4]
+        dA[4] -= 2*A[3]
+
+        # ODE x' = f(x)
+        out[36] = v1
+        out[37] = v2
+        out[38] = v3
+        out[39] = x1 + 2*v2 - c1*dx1 - c2*dx2
+        out[40] = x2 - 2*v1 - c12*x2
+        out[41] = -c12*x3
+
 
 class MRP(object):
 
@@ -106,3 +202,37 @@ class MRP(object):
         # Updated state
         state = numpy.append(s, w, axis=0)
         return state
+
+    @classmethod
+    @inplace
+    def func(cls, t, y, out, params):
+        ''' In-place function handle for equation of motion '''
+        # Inertia and its inverse are unpacked once per integration call
+        if 'moments_inverse' not in params:
+            params['moments_rows'] = numpy.asarray(params['moments'], dtype='float').tolist()
+            params['moments_inverse'] = numpy.linalg.inv(params['moments']).tolist()
+
+        I = params['moments_rows']
+        I_INV = params['moments_inverse']
+        [u1, u2, u3] = numpy.ravel(params['control_torque'])[0:3].tolist()
+        [s1, s2, s3, w1, w2, w3] = y[:,0].tolist()
+
+        # Equation of motion
+        # s' = 1/4*((1-|s|^2)*w + 2*(s x w) + 2*s*(s.w))
+        s_squared = s1*s1 + s2*s2 + s3*s3
+        s_dot_w = s1*w1 + s2*w2 + s3*w3
+        out[0,0] = .25*((1-s_squared)*w1 + 2*(s2*w3 - s3*w2) + 2*s1*s_dot_w)
+        out[1,0] = .25*((1-s_squared)*w2 + 2*(s3*w1 - s1*w3) + 2*s2*s_dot_w)
+        out[2,0] = .25*((1-s_squared)*w3 + 2*(s1*w2 - s2*w1) + 2*s3*s_dot_w)
+
+        # Rate calculation
+        # w' = -I^-1*(w x I*w) + u
+        h1 = I[0][0]*w1 + I[0][1]*w2 + I[0][2]*w3
+        h2 = I[1][0]*w1 + I[1][1]*w2 + I[1][2]*w3
+        h3 = I[2][0]*w1 + I[2][1]*w2 + I[2][2]*w3
+        g1 = w2*h3 - w3*h2
+        g2 = w3*h1 - w1*h3
+        g3 = w1*h2 - w2*h1
+        out[3,0] = -(I_INV[0][0]*g1 + I_INV[0][1]*g2 + I_INV[0][2]*g3) + u1
+        out[4,0] = -(I_INV[1][0]*g1 + I_INV[1][1]*g2 + I_INV[1][2]*g3) + u2
+        out[5,0] = -(I_INV[2][0]*g1 + I_INV[2][1]*g2 + I_INV[2][2]*g3) + u3
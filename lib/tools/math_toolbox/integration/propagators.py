@@ -0,0 +1,111 @@
+import math
+import numpy
+
+from lib.tools.generators import xmat
+from lib.tools.conversions import mrp_shadow
+
+
+class RigidBodyMRP(object):
+    ''' Fused fixed step (RK4) propagator for rigid body MRP attitude dynamics '''
+
+    def __init__(self, moments=None):
+        # Inertia and its inverse are unpacked once per vehicle
+        self.moments = tuple(numpy.ravel(numpy.asarray(moments, dtype='float')).tolist())
+        self.moments_inverse = tuple(numpy.ravel(numpy.linalg.inv(moments)).tolist())
+
+    def derivative(self, s1, s2, s3, w1, w2, w3, u1, u2, u3):
+        ''' Equation of motion for the MRP set and body rates (floats) '''
+        (i11, i12, i13, i21, i22, i23, i31, i32, i33) = self.moments
+        (j11, j12, j13, j21, j22, j23, j31, j32, j33) = self.moments_inverse
+
+        # s' = 1/4*((1-|s|^2)*w + 2*(s x w) + 2*s*(s.w))
+        c = .25*(1 - s1*s1 - s2*s2 - s3*s3)
+        d = .5*(s1*w1 + s2*w2 + s3*w3)
+        ds1 = c*w1 + .5*(s2*w3 - s3*w2) + d*s1
+        ds2 = c*w2 + .5*(s3*w1 - s1*w3) + d*s2
+        ds3 = c*w3 + .5*(s1*w2 - s2*w1) + d*s3
+
+        # w' = -I^-1*(w x I*w) + u
+        h1 = i11*w1 + i12*w2 + i13*w3
+        h2 = i21*w1 + i22*w2 + i23*w3
+        h3 = i31*w1 + i32*w2 + i33*w3
+        g1 = w2*h3 - w3*h2
+        g2 = w3*h1 - w1*h3
+        g3 = w1*h2 - w2*h1
+        dw1 = u1 - (j11*g1 + j12*g2 + j13*g3)
+        dw2 = u2 - (j21*g1 + j22*g2 + j23*g3)
+        dw3 = u3 - (j31*g1 + j32*g2 + j33*g3)
+        return (ds1, ds2, ds3, dw1, dw2, dw3)
+
+    def jacobian(self, state=None):
+        ''' Analytic (6x6) Jacobian of the equation of motion (torque free) '''
+        y = numpy.ravel(state)
+        s = y[0:3]
+        w = y[3:6]
+        I = numpy.reshape(self.moments, (3,3))
+        I_INV = numpy.reshape(self.moments_inverse, (3,3))
+
+        S_XMAT = xmat(s)
+        W_XMAT = xmat(w)
+        H_XMAT = xmat(numpy.matmul(I, w))
+
+        J = numpy.zeros((6,6))
+        # ds'/ds = 1/4*(-2*w*s^T - 2*[w x] + 2*(s.w)*I + 2*s*w^T)
+        J[0:3,0:3] = .5*(numpy.dot(s, w)*numpy.identity(3) - W_XMAT + numpy.outer(s, w) - numpy.outer(w, s))
+        # ds'/dw = 1/4*((1-|s|^2)*I + 2*[s x] + 2*s*s^T)
+        J[0:3,3:6] = .25*((1-numpy.dot(s, s))*numpy.identity(3) + 2*S_XMAT + 2*numpy.outer(s, s))
+        # dw'/dw = -I^-1*([w x]*I - [Iw x])
+        J[3:6,3:6] = -numpy.matmul(I_INV, numpy.matmul(W_XMAT, I) - H_XMAT)
+        return J
+
+    def rosenbrock_step(self, state=None, h=0, control_torque=None, feedback=None):
+        ''' Advance the (6x1) state by one ROS2 (W-method) step, switching to the shadow set if |s| > 1.
+            The optional (3x6) feedback is the torque Jacobian of a linear control law about state '''
+        y = numpy.ravel(state).astype('float')
+        u = numpy.ravel(control_torque)[0:3].astype('float')
+        gamma = 1 + 1/math.sqrt(2)
+
+        J = self.jacobian(y)
+        if feedback is not None:
+            J[3:6] += feedback
+
+        def closed_loop(x):
+            ''' Equation of motion with the linearized control law '''
+            torque = u if feedback is None else u + numpy.matmul(feedback, x-y)
+            return numpy.asarray(self.derivative(*x.tolist(), *torque.tolist()))
+
+        # Both stages share a single factorization of W = I - gamma*h*J
+        W_INV = numpy.linalg.inv(numpy.identity(6) - gamma*h*J)
+        k1 = numpy.matmul(W_INV, closed_loop(y))
+        k2 = numpy.matmul(W_INV, closed_loop(y + h*k1) - 2*k1)
+        y = y + 1.5*h*k1 + 0.5*h*k2
+
+        # Shadow set check
+        y[0:3] = mrp_shadow(y[0:3])
+        return numpy.reshape(y, (6,1))
+
+    def step(self, state=None, h=0, control_torque=None):
+        ''' Advance the (6x1) state by one RK4 step, switching to the shadow set if |s| > 1 '''
+        (y1, y2, y3, y4, y5, y6) = numpy.ravel(state).tolist()
+        (u1, u2, u3) = numpy.ravel(control_torque)[0:3].tolist()
+        f = self.derivative
+        g = .5*h
+
+        k1 = f(y1, y2, y3, y4, y5, y6, u1, u2, u3)
+        k2 = f(y1+g*k1[0], y2+g*k1[1], y3+g*k1[2], y4+g*k1[3], y5+g*k1[4], y6+g*k1[5], u1, u2, u3)
+        k3 = f(y1+g*k2[0], y2+g*k2[1], y3+g*k2[2], y4+g*k2[3], y5+g*k2[4], y6+g*k2[5], u1, u2, u3)
+        k4 = f(y1+h*k3[0], y2+h*k3[1], y3+h*k3[2], y4+h*k3[3], y5+h*k3[4], y6+h*k3[5], u1, u2, u3)
+
+        w = h/6
+        y1 += w*(k1[0] + 2*(k2[0] + k3[0]) + k4[0])
+        y2 += w*(k1[1] + 2*(k2[1] + k3[1]) + k4[1])
+        y3 += w*(k1[2] + 2*(k2[2] + k3[2]) + k4[2])
+        y4 += w*(k1[3] + 2*(k2[3] + k3[3]) + k4[3])
+        y5 += w*(k1[4] + 2*(k2[4] + k3[4]) + k4[4])
+        y6 += w*(k1[5] + 2*(k2[5] + k3[5]) + k4[5])
+
+        # Shadow set check
+        s_squared = y1*y1 + y2*y2 + y3*y3
+        if s_squared > 1:
+            (y1, y2, y3) = (-y1/s_squared, -y2/s_squared, -y3/s_squared)
+        return numpy.array([[y1], [y2], [y3], [y4], [y5], [y6]])
@@ -0,0 +1,43 @@
+import math
+import numpy
+
+
+def _basis(theta=None):
+    ''' Cubic Hermite basis functions for the normalized interval position theta '''
+    theta_2 = theta*theta
+    theta_3 = theta_2*theta
+
+    h00 = 2*theta_3 - 3*theta_2 + 1
+    h10 = theta_3 - 2*theta_2 + theta
+    h01 = -2*theta_3 + 3*theta_2
+    h11 = theta_3 - theta_2
+    return [h00, h10, h01, h11]
+
+def uniform_cubic_hermite(x=None, **kwargs):
+    ''' Cubic Hermite interpolation of samples (columns) on a uniform grid '''
+    y = kwargs['y']
+    dy = kwargs['dy']
+    x0 = kwargs.get('x0', 0)
+    h = kwargs['h']
+
+    intervals = y.shape[-1]-1
+    periodic = kwargs.get('periodic', False)
+
+    # Periodic tables store the closing sample (y[:,0] == y[:,-1]),
+    # non periodic tables extrapolate from the end intervals
+    if numpy.ndim(x) == 0:
+        # Scalar queries stay on plain floats (a single column lookup)
+        position = (float(x)-x0)/h
+        if periodic:
+            position = position % intervals
+        idx = min(max(int(math.floor(position)), 0), intervals-1)
+    else:
+        position = (numpy.asarray(x, dtype='float')-x0)/h
+        if periodic:
+            position = numpy.mod(position, intervals)
+        idx = numpy.clip(numpy.floor(position).astype(int), 0, intervals-1)
+    theta = position - idx
+
+    [h00, h10, h01, h11] = _basis(theta)
+    interpolant = h00*y[:,idx] + h*h10*dy[:,idx] + h01*y[:,idx+1] + h*h11*dy[:,idx+1]
+    return numpy.reshape(interpolant, (y.shape[0], -1))
@@ -1,53 +1,64 @@
 import lib.tools.math_toolbox.integration.integrands as seed
 import lib.tools.math_toolbox.integration.integrals as integrate
 
-from lib.simcore.function_library import feval
-
 
 def ode113v(**kwargs):
     ''' Adam's & Bashforth ODE (non-stiff) for single state dynamics '''
     kwargs['h'] = kwargs['delta']
     kwargs['x'] = kwargs['tspan']
     kwargs['y'] = kwargs['state']
-    return integrate.ABM4(seed.CRTBP.vfhandle, **kwargs)
+    return integrate.ABM4(seed.CRTBP.vfunc, **kwargs)
 
 def ode113m(**kwargs):
     ''' Adam's & Bashforth ODE (non-stiff) for multi-state dynamics '''
     kwargs['h'] = kwargs['delta']
     kwargs['x'] = kwargs['tspan']
     kwargs['y'] = kwargs['state']
-    return integrate.ABM4(seed.CRTBP.mfhandle, **kwargs)
+    return integrate.ABM4(seed.CRTBP.mfunc, **kwargs)
 
 def ode45v(**kwargs):
-    ''' Runge-Kutta 4th order ODE (non-stiff) for single state dynamics '''
-    kwargs['h'] = kwargs['delta']
+    ''' Dormand & Prince adaptive ODE (non-stiff) for single state dynamics '''
+    kwargs['h'] = kwargs.get('delta')
     kwargs['x'] = kwargs['tspan']
     kwargs['y'] = kwargs['state']
-    return integrate.RK4(seed.MRP.fhandle, **kwargs)
+    kwargs['xout'] = kwargs.get('tout')
+    return integrate.DOPRI45(seed.CRTBP.vfunc, **kwargs)
 
-def newton_raphson(fhandle=None, **kwargs):
-    ''' Newton Raphson root finding method '''
-    dfhandle = kwargs['df']
-    x_initial = kwargs['x']
+def ode45m(**kwargs):
+    ''' Dormand & Prince adaptive ODE (non-stiff) for multi-state dynamics '''
+    kwargs['h'] = kwargs.get('delta')
+    kwargs['x'] = kwargs['tspan']
+    kwargs['y'] = kwargs['state']
+    kwargs['xout'] = kwargs.get('tout')
+    return integrate.DOPRI45(seed.CRTBP.mfunc, **kwargs)
 
-    tolerance = 1e-8
-    MAX_ITERS = 1000
+def ode45a(**kwargs):
+    ''' Dormand & Prince adaptive ODE (non-stiff) for attitude dynamics '''
+    kwargs['h'] = kwargs.get('delta')
+    kwargs['x'] = kwargs['tspan']
+    kwargs['y'] = kwargs['state']
+    kwargs['xout'] = kwargs.get('tout')
+    return integrate.DOPRI45(seed.MRP.func, **kwargs)
 
-    curr_iter = 0
-    f = feval(fhandle, **kwargs)
-    df = feval(dfhandle, **kwargs)
-    
-    x = x_initial - f/df
-    error = abs(x - x_initial)
+def ode78v(**kwargs):
+    ''' Runge-Kutta-Fehlberg 8th order adaptive ODE (non-stiff) for single state dynamics '''
+    kwargs['h'] = kwargs.get('delta')
+    kwargs['x'] = kwargs['tspan']
+    kwargs['y'] = kwargs['state']
+    kwargs['xout'] = kwargs.get('tout')
+    return integrate.RKF78(seed.CRTBP.vfunc, **kwargs)
 
-    while error > tolerance and curr_iter < MAX_ITERS:
-        kwargs['x'] = x
-        f = feval(fhandle, **kwargs)
-        df = feval(dfhandle, **kwargs)
-        
-        x_n = x - f/df
-        error = abs(x_n - x)
+def ode78m(**kwargs):
+    ''' Runge-Kutta-Fehlberg 8th order adaptive ODE (non-stiff) for multi-state dynamics '''
+    kwargs['h'] = kwargs.get('delta')
+    kwargs['x'] = kwargs['tspan']
+    kwargs['y'] = kwargs['state']
+    kwargs['xout'] = kwargs.get('tout')
+    return integrate.RKF78(seed.CRTBP.mfunc, **kwargs)
 
-        curr_iter = curr_iter + 1
-        x = x_n
-    return x
\ No newline at end of file
+def ode4a(**kwargs):
+    ''' Runge-Kutta 4th order fixed step ODE (non-stiff) for attitude dynamics '''
+    kwargs['h'] = kwargs['delta']
+    kwargs['x'] = kwargs['tspan']
+    kwargs['y'] = kwargs['state']
+    return integrate.RK4(seed.MRP.func, **kwargs)
@@ -0,0 +1,183 @@
+import time
+import numpy
+
+from lib.gnc.cr3bp import LCR3BP
+from lib.gnc.libration.dynamics import Orbit
+from lib.simcore.support.variables import GLOBALS
+from lib.models.orbiter import Vehicle
+from lib.tools.math_toolbox.ode import solver
+from lib.tools.math_toolbox.integration import integrals
+from lib.tools.math_toolbox.integration.propagators import RigidBodyMRP
+from lib.tools.math_toolbox.integration.integrands import CRTBP
+
+# Integrator scaling benchmark. The integrators write into
+# preallocated output buffers, so the wall time per step
+# should stay flat as the number of steps grows (O(n) total)
+
+elements = LCR3BP(sbdy=GLOBALS.LUNAR['MU'], lbdy=GLOBALS.EARTH['MU'])
+Halo_Orbit = Orbit(elements)
+
+initial_state = numpy.append(elements.position, elements.velocity)
+initial_state = numpy.reshape(initial_state, (6,1))
+
+STEP_COUNTS = [2500, 5000, 10000, 20000, 40000]
+
+print('Fixed step integrator scaling (CRTBP, single state)')
+print('%-6s %10s %12s %16s' % ('method', 'steps', 'time (s)', 'time/step (us)'))
+
+for method in (integrals.RK4, integrals.ABM4):
+    for steps in STEP_COUNTS:
+        h = elements.period/steps
+
+        start = time.perf_counter()
+        [x_state, y_state] = method(CRTBP.vfhandle, h=h, x=(0, steps*h), y=initial_state, mu=Halo_Orbit.mu)
+        elapsed = time.perf_counter() - start
+
+        print('%-6s %10d %12.4f %16.2f' % (method.__name__, y_state.shape[1]-1, elapsed, 1e6*elapsed/steps))
+
+
+# High order adaptive propagation benchmark. The RKF78 tolerance is
+# tightened until its final state error over one halo period matches
+# the fixed step ABM4 (ode113v) solution at the nominal step size
+
+class Counter(object):
+    ''' Integrand wrapper counting function evaluations '''
+
+    def __init__(self, fhandle=None):
+        self.fhandle = fhandle
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls = self.calls + 1
+        return self.fhandle(**kwargs)
+
+print('')
+print('Halo propagation over one period at matched accuracy')
+print('%-6s %10s %12s %12s %12s %12s' % ('method', 'tolerance', 'evaluations', 'mean step', 'time (s)', 'error'))
+
+for h in (2e-4, 1e-3):
+    counter = Counter(CRTBP.vfhandle)
+    start = time.perf_counter()
+    [x_state, y_state] = integrals.ABM4(counter, h=h, x=(0, elements.period), y=initial_state, mu=Halo_Orbit.mu)
+    elapsed = time.perf_counter() - start
+
+    # Reference solution over the same (truncated) time span
+    tspan = (0, x_state[-1])
+    [_, reference] = integrals.RKF78(CRTBP.vfhandle, x=tspan, y=initial_state, mu=Halo_Orbit.mu, rtol=1e-14, atol=1e-14)
+
+    abm_error = numpy.max(numpy.absolute(y_state[:,-1] - reference[:,-1]))
+    print('%-6s %10s %12d %12.2e %12.4f %12.2e' % ('ABM4', 'h=%.0e' % h, counter.calls, h, elapsed, abm_error))
+
+    for tolerance in 10.0**-numpy.arange(6, 14):
+        counter = Counter(CRTBP.vfhandle)
+        start = time.perf_counter()
+        [x_state, y_state] = integrals.RKF78(counter, x=tspan, y=initial_state, mu=Halo_Orbit.mu, rtol=tolerance, atol=tolerance)
+        elapsed = time.perf_counter() - start
+        error = numpy.max(numpy.absolute(y_state[:,-1] - reference[:,-1]))
+        if error <= abm_error:
+            break
+    mean_step = tspan[-1]/(len(x_state)-1)
+    print('%-6s %10.0e %12d %12.2e %12.4f %12.2e' % ('RKF78', tolerance, counter.calls, mean_step, elapsed, error))
+
+
+# Ensemble propagation benchmark. Dispersed initial states are
+# stacked as columns and advanced together in a single call
+
+ENSEMBLE_SIZE = 100
+
+dispersions = 1e-4*numpy.random.default_rng(0).standard_normal((6, ENSEMBLE_SIZE))
+ensemble_state = initial_state + dispersions
+
+print('')
+print('Ensemble propagation over half a period (%d states)' % ENSEMBLE_SIZE)
+print('%-8s %14s %14s' % ('method', 'single (s)', 'ensemble (s)'))
+
+for method, options in ((integrals.ABM4, {'h': 1e-3}), (integrals.RKF78, {'rtol': 1e-10, 'atol': 1e-10})):
+    tspan = (0, elements.period/2)
+
+    start = time.perf_counter()
+    method(CRTBP.vfhandle, x=tspan, y=initial_state, mu=Halo_Orbit.mu, **options)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    method(CRTBP.vfhandle, x=tspan, y=ensemble_state, mu=Halo_Orbit.mu, **options)
+    ensemble = time.perf_counter() - start
+
+    print('%-8s %14.4f %14.4f' % (method.__name__, single, ensemble))
+
+
+# Integrand protocol benchmark. Keyword integrands rebuild the
+# argument dictionary on every call, in-place integrands receive
+# fixed positional arguments and write into a caller owned array
+
+EVALUATIONS = 20000
+
+derivative = numpy.empty((6,1))
+parameters = {'mu': Halo_Orbit.mu}
+
+start = time.perf_counter()
+for idx in range(EVALUATIONS):
+    CRTBP.vfhandle(x=0, y=initial_state, mu=Halo_Orbit.mu)
+keyword_time = (time.perf_counter() - start)/EVALUATIONS
+
+start = time.perf_counter()
+for idx in range(EVALUATIONS):
+    CRTBP.vfunc(0, initial_state, derivative, parameters)
+inplace_time = (time.perf_counter() - start)/EVALUATIONS
+
+print('')
+print('Integrand evaluation overhead (CRTBP, single state)')
+print('%-10s %16s' % ('protocol', 'time/call (us)'))
+print('%-10s %16.2f' % ('keyword', 1e6*keyword_time))
+print('%-10s %16.2f' % ('in-place', 1e6*inplace_time))
+
+print('')
+print('ABM4 propagation over one period (h=1e-3)')
+print('%-10s %12s' % ('protocol', 'time (s)'))
+for name, fhandle in (('keyword', CRTBP.vfhandle), ('in-place', CRTBP.vfunc)):
+    start = time.perf_counter()
+    integrals.ABM4(fhandle, h=1e-3, x=(0, elements.period), y=initial_state, mu=Halo_Orbit.mu)
+    print('%-10s %12.4f' % (name, time.perf_counter() - start))
+
+
+# State transition matrix benchmark. The variational equations
+# are propagated alongside the state for the halo corrector
+
+transition_state = numpy.append(numpy.reshape(numpy.identity(6), (36,1)), initial_state, axis=0)
+
+print('')
+print('ABM4 propagation over half a period (h=1e-3)')
+print('%-22s %12s' % ('integrand', 'time (s)'))
+for name, fhandle, state in (('state (vfunc)', CRTBP.vfunc, initial_state),
+                             ('state + STM (mfunc)', CRTBP.mfunc, transition_state),
+                             ('state + STM (mfhandle)', CRTBP.mfhandle, transition_state)):
+    start = time.perf_counter()
+    integrals.ABM4(fhandle, h=1e-3, x=(0, elements.period/2), y=state, mu=Halo_Orbit.mu)
+    print('%-22s %12.4f' % (name, time.perf_counter() - start))
+
+
+# Attitude step benchmark. The vehicle loop takes a single 0.1 s
+# step per sample, so the generic integrator call overhead dominates
+
+ATTITUDE_STEPS = 5000
+
+vehicle = Vehicle()
+attitude_state = numpy.append(vehicle.mrp, vehicle.rates, axis=0)
+control_torque = numpy.zeros((6,1))
+propagator = RigidBodyMRP(vehicle.moments)
+
+start = time.perf_counter()
+for idx in range(ATTITUDE_STEPS):
+    solver.ode4a(tspan=(0,.1), delta=.1, state=attitude_state, moments=vehicle.moments, control_torque=control_torque)
+generic_time = (time.perf_counter() - start)/ATTITUDE_STEPS
+
+start = time.perf_counter()
+for idx in range(ATTITUDE_STEPS):
+    propagator.step(attitude_state, .1, control_torque)
+fused_time = (time.perf_counter() - start)/ATTITUDE_STEPS
+
+print('')
+print('Single RK4 attitude step (MRP rigid body)')
+print('%-10s %16s' % ('method', 'time/step (us)'))
+print('%-10s %16.2f' % ('ode4a', 1e6*generic_time))
+print('%-10s %16.2f' % ('fused', 1e6*fused_time))
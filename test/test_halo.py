@@ -1,4 +1,3 @@
-import numpy
 import matplotlib.pyplot as mplot
 
 from mpl_toolkits.mplot3d import Axes3D
@@ -38,19 +37,14 @@ Earth_xlocation = -Halo_Orbit.mu
 Lunar_xlocation = 1-Halo_Orbit.mu
 
 # ECI frame
-trajectory_eci = numpy.empty((6,0))
-
-elapsed_time = trajectory.shape[1]
-for t in range(elapsed_time):
-    eci_vector = Halo_Orbit.Frames.barycenter_fixed_to_barycenter_earth_inertial(trajectory[:,t])
-    trajectory_eci = numpy.append(trajectory_eci, eci_vector, axis=1)
+trajectory_eci = Halo_Orbit.Frames.barycenter_fixed_to_barycenter_earth_inertial_batch(trajectory)
     
-time_in_eci_frame = [idx*elements.step*GLOBALS.LUNAR['T_ORBIT'] for idx in range(trajectory_eci.shape[1])]
+time_in_eci_frame = [idx*trajectory.step*GLOBALS.LUNAR['T_ORBIT'] for idx in range(trajectory_eci.shape[1])]
 
 # Verify the satellite velocity normal to the orbital plane is
 # approx. the mean orbital speed of moon (1.022 km/s). This should
 # occur when the satellite is directly above or below the moon (~1{3}/4 T)
-lunar_match_time = int(elements.period/elements.step)//5
+lunar_match_time = trajectory.samples//5
 
 # Plot HALO model
 fig1 = mplot.figure()
@@ -78,7 +72,7 @@ ax.legend(loc='upper left')
 fig3 = mplot.figure()
 ax = fig3.gca()
 barycentric_common_time = ax.get_xticks()
-eci_frame_ref_time = barycentric_common_time*GLOBALS.LUNAR['T_ORBIT']*elements.step*trajectory_eci.shape[1]
+eci_frame_ref_time = barycentric_common_time*GLOBALS.LUNAR['T_ORBIT']*trajectory.step*trajectory_eci.shape[1]
 ax.set_xticks(eci_frame_ref_time)
 ax.plot(time_in_eci_frame, trajectory_eci[0,:], color='blue', label='x-axis')
 ax.plot(time_in_eci_frame, trajectory_eci[1,:], color='red', label='y-axis')
@@ -101,7 +95,7 @@ ax.legend(loc='upper left')
 fig5 = mplot.figure()
 ax = fig5.gca()
 barycentric_common_time = ax.get_xticks()
-eci_frame_ref_time = barycentric_common_time*GLOBALS.LUNAR['T_ORBIT']*elements.step*trajectory_eci.shape[1]
+eci_frame_ref_time = barycentric_common_time*GLOBALS.LUNAR['T_ORBIT']*trajectory.step*trajectory_eci.shape[1]
 ax.set_xticks(eci_frame_ref_time)
 ax.plot(time_in_eci_frame, trajectory_eci[3,:], color='blue', label='x-axis')
 ax.plot(time_in_eci_frame, trajectory_eci[4,:], color='red', label='y-axis')
@@ -13,17 +13,12 @@ from mpl_toolkits.mplot3d import Axes3D
 elements = Kepler(e=0.6, a=6541.4, i=56.2, argp=90, raan=0)
 Lunar_Orbit = Orbit(elements)
 
-state_space_lci = numpy.empty((6,0))
-state_space_eci = numpy.empty((6,0))
-
-for n in range(Lunar_Orbit.total_orbital_samples()):
-    # Moon
-    state_vector_lci = Lunar_Orbit.inertial_solution(n)
-    state_space_lci = numpy.append(state_space_lci, state_vector_lci, axis=1)
+# Moon
+samples = numpy.arange(Lunar_Orbit.total_orbital_samples())
+state_space_lci = Lunar_Orbit.inertial_solution(samples)
 
-    # Earth
-    state_vector_eci = Lunar_Orbit.Frames.barycenter_lunar_inertial_to_barycenter_earth_inertial(state_vector_lci)
-    state_space_eci = numpy.append(state_space_eci, state_vector_eci, axis=1)
+# Earth
+state_space_eci = Lunar_Orbit.Frames.barycenter_lunar_inertial_to_barycenter_earth_inertial(state_space_lci)
 
 # Define Earth model
 earth_radius = GLOBALS.EARTH['RADIUS']
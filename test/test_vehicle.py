@@ -19,9 +19,9 @@ elm_halo = LCR3BP(h=2e-4, sbdy=GLOBALS.LUNAR['MU'], lbdy=GLOBALS.EARTH['MU'], cy
 Halo_Orbit = L2(elm_halo)
 Lunar_Orbit = Lunar(elm_moon)
 
-# Create the satellites
+# Create the satellites (halo constructed in the background)
+L2_Satellite = Target(Halo_Orbit, construction='thread')
 Orbiter = Satellite(Lunar_Orbit)
-L2_Satellite = Target(Halo_Orbit)
 
 # Configure the orbiter tracking (optional)
 Orbiter.configure_tracking(L2_Satellite)